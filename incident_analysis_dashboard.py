@@ -1,11 +1,16 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import numpy as np
+import pyarrow as pa
 from datetime import datetime, timedelta
-import calendar
+from collections import OrderedDict
+from contextlib import closing
+import hashlib
+import io
+import os
+import time
+import threading
+import sqlite3
 
 # Sivun konfiguraatio
 st.set_page_config(
@@ -57,6 +62,8 @@ def get_finnish_month_name(month_num):
 
 def create_calendar_view(daily_stats):
     """Luo kalenterinäkymä päivittäisistä tilastoista"""
+    import calendar
+    
     if len(daily_stats) == 0:
         return None
     
@@ -142,6 +149,13 @@ def create_calendar_view(daily_stats):
                     day_text_color = "#28a745" if row['day_target_met'] else "#dc3545"  # Vihreä jos tavoite täyttyy, muuten punainen
                     night_text_color = "#28a745" if row['night_target_met'] else "#dc3545"  # Vihreä jos tavoite täyttyy, muuten punainen
                     
+                    # Poikkeavan päivän merkintä
+                    anomaly_badge = ""
+                    if not row.get('anomaly_checked', True):
+                        anomaly_badge = '<div style="color: #999; font-size: 10px; margin-top: 2px;" title="Poikkeamia ei tarkistettu">– ei tarkistettu</div>'
+                    elif row.get('anomaly_day', False):
+                        anomaly_badge = '<div style="color: #dc3545; font-size: 10px; font-weight: bold; margin-top: 2px;" title="Poikkeavia tunteja">⚠️ Poikkeama</div>'
+                    
                     calendar_html += f"""
                     <td style="padding: 10px; border: {border_width} solid {border_color}; background-color: {bg_color}; vertical-align: top; height: 85px; position: relative; transition: all 0.3s ease;">
                         <div style="font-weight: bold; font-size: 18px; margin-bottom: 6px; color: #333;">{day}</div>
@@ -149,6 +163,7 @@ def create_calendar_view(daily_stats):
                             <div style="color: {day_text_color}; font-weight: bold; margin-bottom: 1px;">P: {row['day_shift_avg']:.2f}</div>
                             <div style="color: {night_text_color}; font-weight: bold; margin-bottom: 1px;">Y: {row['night_shift_avg']:.2f}</div>
                             <div style="color: #666; font-size: 10px; background-color: rgba(255,255,255,0.7); padding: 1px 3px; border-radius: 3px; display: inline-block;">{row['total_incidents']:.0f} inc</div>
+                            {anomaly_badge}
                         </div>
                     </td>
                     """
@@ -186,6 +201,14 @@ def create_calendar_view(daily_stats):
                     <span style="display: inline-block; width: 16px; height: 16px; background-color: #ffffff; border: 2px solid #dee2e6; border-radius: 3px;"></span>
                     <span style="font-size: 13px; font-weight: 500;">Ei dataa</span>
                 </span>
+                <span style="display: flex; align-items: center; gap: 8px;">
+                    <span style="font-size: 13px;">⚠️</span>
+                    <span style="font-size: 13px; font-weight: 500;">Poikkeavia tunteja</span>
+                </span>
+                <span style="display: flex; align-items: center; gap: 8px;">
+                    <span style="font-size: 13px; color: #999;">–</span>
+                    <span style="font-size: 13px; font-weight: 500;">Poikkeamia ei tarkistettu</span>
+                </span>
             </div>
             <div style="text-align: center; margin-top: 12px; font-size: 12px; color: #888;">
                 <strong style="color: #28a745;">P:</strong> Päivätyöntekijät (tavoite ≥5.1) | <strong style="color: #6f42c1;">Y:</strong> Yötyöntekijät (tavoite ≥4.6) | <strong>inc:</strong> Incidentit yhteensä
@@ -301,7 +324,8 @@ def calculate_daily_stats(df):
     """Laske päivittäiset tilastot"""
     daily_stats = []
     
-    for date_str in df['date_str'].unique():
+    # Päivät aikajärjestyksessä (ISO-muotoiset merkkijonot lajittuvat oikein, puuttuvat viimeisenä)
+    for date_str in df['date_str'].drop_duplicates().sort_values():
         day_data = df[df['date_str'] == date_str]
         
         # Jaa päivä- ja yötyöntekijöihin
@@ -324,8 +348,885 @@ def calculate_daily_stats(df):
     
     return pd.DataFrame(daily_stats)
 
+# Trendianalyysin ikkunat päivinä
+TREND_SHORT_WINDOW = 7
+TREND_LONG_WINDOW = 28
+TREND_BASE_COLUMNS = ['date', 'day_name', 'total_incidents', 'day_shift_avg', 'night_shift_avg', 'day_target_met', 'night_target_met']
+
+def _add_rolling_trend_columns(trend):
+    """Lisää liukuvat keskiarvot ja viikkomuutokset aikajärjestetylle päivädatalle"""
+    indexed = trend.set_index('date_obj')
+    for shift in ['day_shift_avg', 'night_shift_avg']:
+        # Keskiarvot ovat kahden desimaalin tarkkoja, joten sadasosina summat ovat tarkkoja
+        # eivätkä riipu siitä, kuinka pitkästä historiasta ikkunaa liu'utetaan
+        cents = (indexed[shift] * 100).round()
+        averages = {}
+        for window in [TREND_SHORT_WINDOW, TREND_LONG_WINDOW]:
+            # Aikaperusteinen ikkuna käsittelee puuttuvat päivät oikein ja on O(n)
+            rolling = cents.rolling(f"{window}D")
+            averages[window] = rolling.sum() / rolling.count() / 100
+        
+        short_avg = averages[TREND_SHORT_WINDOW]
+        previous_week = short_avg.reindex(short_avg.index - pd.Timedelta(days=7)).values
+        
+        trend[f'{shift}_{TREND_SHORT_WINDOW}d'] = short_avg.round(2).values
+        trend[f'{shift}_{TREND_LONG_WINDOW}d'] = averages[TREND_LONG_WINDOW].round(2).values
+        trend[f'{shift}_wow'] = (short_avg.values - previous_week).round(2)
+    return trend
+
+def _add_streak_columns(trend, day_carry=0, night_carry=0, previous_date=None):
+    """Lisää peräkkäisten tavoitepäivien putket; puuttuva päivä katkaisee putken"""
+    one_day = pd.Timedelta(days=1)
+    gap = trend['date_obj'].diff() != one_day
+    if previous_date is not None and len(trend) > 0:
+        gap.iloc[0] = trend['date_obj'].iloc[0] - previous_date != one_day
+    
+    for target_col, streak_col, carry in [
+        ('day_target_met', 'day_streak', day_carry),
+        ('night_target_met', 'night_streak', night_carry)
+    ]:
+        met = trend[target_col].astype(bool)
+        run_id = (~met | gap).cumsum()
+        streak = met.astype(int).groupby(run_id).cumsum()
+        # Ilman katkosta alkava ensimmäinen putki jatkaa aiemman historian viimeistä putkea
+        streak[run_id == 0] += carry
+        trend[streak_col] = streak.values
+    return trend
+
+def _prepare_trend_base(daily_stats):
+    """Valitse trendien lähtösarakkeet aikajärjestyksessä ilman tuntemattomia päivämääriä"""
+    trend = daily_stats[TREND_BASE_COLUMNS].copy()
+    trend['date_obj'] = pd.to_datetime(trend['date'], errors='coerce')
+    return trend.dropna(subset=['date_obj']).sort_values('date_obj').reset_index(drop=True)
+
+def calculate_trend_stats(daily_stats):
+    """Laske liukuvat keskiarvot, tavoiteputket ja viikkomuutokset päivittäisistä tilastoista"""
+    if len(daily_stats) == 0:
+        return pd.DataFrame()
+    
+    trend = _prepare_trend_base(daily_stats)
+    if len(trend) == 0:
+        return pd.DataFrame()
+    
+    trend = _add_rolling_trend_columns(trend)
+    return _add_streak_columns(trend)
+
+def update_trend_stats(trend_stats, changed_daily):
+    """Päivitä trenditilastot uusilla tai muuttuneilla päivillä laskematta koko historiaa uudelleen"""
+    if trend_stats is None or len(trend_stats) == 0:
+        return calculate_trend_stats(changed_daily)
+    
+    changed = _prepare_trend_base(changed_daily)
+    if len(changed) == 0:
+        return trend_stats
+    
+    # Ensimmäistä muutosta edeltävät rivit säilyvät; sen jälkeiset lasketaan uudelleen,
+    # koska niiden ikkunat ja putket riippuvat muuttuneista päivistä
+    first_changed = changed['date_obj'].iloc[0]
+    kept = trend_stats[trend_stats['date_obj'] < first_changed]
+    later = trend_stats[(trend_stats['date_obj'] >= first_changed) & ~trend_stats['date'].isin(changed['date'])]
+    recomputed = pd.concat([later[TREND_BASE_COLUMNS + ['date_obj']], changed], ignore_index=True)
+    recomputed = recomputed.sort_values('date_obj').reset_index(drop=True)
+    
+    # Liukuvat ikkunat tarvitsevat vain pisimmän ikkunan verran aiempaa historiaa
+    context_start = first_changed - pd.Timedelta(days=TREND_LONG_WINDOW)
+    context = kept[kept['date_obj'] >= context_start][TREND_BASE_COLUMNS + ['date_obj']]
+    combined = _add_rolling_trend_columns(pd.concat([context, recomputed], ignore_index=True))
+    recomputed = combined.iloc[len(context):].reset_index(drop=True)
+    
+    if len(kept) > 0:
+        last_row = kept.iloc[-1]
+        recomputed = _add_streak_columns(
+            recomputed, int(last_row['day_streak']), int(last_row['night_streak']), last_row['date_obj']
+        )
+    else:
+        recomputed = _add_streak_columns(recomputed)
+    return pd.concat([kept, recomputed], ignore_index=True)
+
+def _profile_values(df):
+    """Poimi päivämäärälliset incidentit (päivämäärä, tunti) -avaimilla; toistuva avain korvaa aiemman"""
+    known = df[df['day_name'] != 'Tuntematon']
+    keys = pd.MultiIndex.from_arrays(
+        [known['date_str'], known['Hour'].astype(int)],
+        names=['date_str', 'hour']
+    )
+    values = pd.Series(known['Incidents handled by agent'].astype(float).values, index=keys)
+    return values[~values.index.duplicated(keep='last')]
+
+def _profile_matrices(values):
+    """Laske (päivämäärä, tunti) -arvoista viikonpäivä × tunti -summat ja lukumäärät yhdellä pivotilla"""
+    cells = pd.DataFrame({
+        'weekday': pd.to_datetime(values.index.get_level_values('date_str')).weekday,
+        'hour': values.index.get_level_values('hour'),
+        'incidents': values.values
+    })
+    pivot = cells.pivot_table(
+        index='weekday',
+        columns='hour',
+        values='incidents',
+        aggfunc=['sum', 'count'],
+        fill_value=0
+    )
+    
+    matrices = {}
+    for agg in ['sum', 'count']:
+        matrix = pivot[agg] if len(pivot) > 0 else pd.DataFrame()
+        matrices[agg] = matrix.reindex(index=range(7), columns=range(24), fill_value=0).astype(float)
+    return matrices
+
+@st.cache_data
+def build_load_profile(df):
+    """Laske viikonpäivä × tunti -kuormitusprofiilin summat ja lukumäärät"""
+    values = _profile_values(df)
+    profile = _profile_matrices(values)
+    # Lasketut avaimet säilytetään, jotta päällekkäiset viennit eivät tuplaannu päivityksessä
+    profile['values'] = values
+    return profile
+
+def update_load_profile(profile, new_df):
+    """Päivitä kuormitusprofiili uusilla riveillä; jo laskettujen tuntien arvot korvataan"""
+    if profile is None:
+        return build_load_profile(new_df)
+    
+    new_values = _profile_values(new_df)
+    replaced = profile['values'].reindex(new_values.index).dropna()
+    
+    # Summat ja lukumäärät ovat additiivisia: vanhat arvot vähennetään ja uudet lisätään
+    removed = _profile_matrices(replaced)
+    added = _profile_matrices(new_values)
+    updated = {
+        agg: profile[agg] - removed[agg] + added[agg]
+        for agg in ['sum', 'count']
+    }
+    updated['values'] = pd.concat([profile['values'].drop(replaced.index), new_values])
+    return updated
+
+def trim_load_profile(profile, start_date):
+    """Poista kuormitusprofiilista annettua päivää vanhemmat tunnit liukuvaa aikaväliä varten"""
+    values = profile['values']
+    dropped = values[values.index.get_level_values('date_str') < str(start_date)]
+    if len(dropped) == 0:
+        return profile
+    
+    removed = _profile_matrices(dropped)
+    trimmed = {
+        agg: profile[agg] - removed[agg]
+        for agg in ['sum', 'count']
+    }
+    trimmed['values'] = values.drop(dropped.index)
+    return trimmed
+
+def calculate_load_profile_matrix(profile):
+    """Muunna kuormitusprofiili keskimääräisiksi incidenteiksi ja incidenteiksi per työntekijä"""
+    workers = np.array([get_worker_count(hour) for hour in range(24)])
+    avg_incidents = profile['sum'] / profile['count'].replace(0, np.nan)
+    incidents_per_worker = avg_incidents / workers
+    return avg_incidents.round(2), incidents_per_worker.round(2)
+
+def create_load_profile_heatmap(profile, value='ratio'):
+    """Luo viikonpäivä × tunti -lämpökartta kuormitusprofiilista"""
+    import plotly.graph_objects as go
+    
+    avg_incidents, incidents_per_worker = calculate_load_profile_matrix(profile)
+    z = incidents_per_worker if value == 'ratio' else avg_incidents
+    z_label = 'Incidentit/työntekijä' if value == 'ratio' else 'Keskimääräiset incidentit'
+    
+    fig = go.Figure(
+        go.Heatmap(
+            z=z.values,
+            x=[f"{hour:02d}:00" for hour in range(24)],
+            y=FINNISH_WEEKDAYS_LONG,
+            customdata=np.dstack([avg_incidents.values, incidents_per_worker.values, profile['count'].values]),
+            colorscale='RdYlGn',
+            colorbar=dict(title=z_label),
+            hovertemplate='<b>%{y} %{x}</b><br>' +
+                         '<b>Keskimääräiset incidentit:</b> %{customdata[0]:.2f}<br>' +
+                         '<b>Incidentit/työntekijä:</b> %{customdata[1]:.2f}<br>' +
+                         '<b>Päivien lukumäärä:</b> %{customdata[2]:.0f}<br>' +
+                         '<extra></extra>'
+        )
+    )
+    fig.update_yaxes(autorange='reversed')
+    fig.update_layout(
+        height=450,
+        title=f"{z_label} viikonpäivittäin ja tunneittain",
+        xaxis_title="Kelloaika",
+        yaxis_title="Viikonpäivä"
+    )
+    return fig
+
+# Ennusteen kausijakso: viikko tunteina
+HOURS_PER_WEEK = 7 * 24
+
+def build_hourly_series(df):
+    """Muodosta aukoton tuntisarja (päivämäärä, tunti) -riveistä"""
+    # Päällekkäisten vientien toistuva (päivämäärä, tunti) korvaa aiemman arvon kuten profiilissa
+    values = _profile_values(df)
+    if len(values) == 0:
+        return pd.Series(dtype=float)
+    
+    timestamps = (
+        pd.to_datetime(values.index.get_level_values('date_str')) +
+        pd.to_timedelta(values.index.get_level_values('hour'), unit='h')
+    )
+    series = pd.Series(values.values, index=timestamps).sort_index()
+    
+    # Puuttuvat tunnit jäävät NaN-arvoiksi, jotta ne eivät vääristä ennustetta
+    full_index = pd.date_range(series.index[0], series.index[-1], freq='h')
+    return series.reindex(full_index).astype(float)
+
+def _weekly_matrix(values):
+    """Leikkaa sarjan loppu kokonaisiksi viikoiksi matriisiin (viikot × 168 tuntia)"""
+    n_weeks = len(values) // HOURS_PER_WEEK
+    return values[len(values) - n_weeks * HOURS_PER_WEEK:].reshape(n_weeks, HOURS_PER_WEEK)
+
+def _forecast_next_week(weeks, method, alpha):
+    """Ennusta seuraavan viikon jokainen tunti viikkomatriisin sarakkeista"""
+    if method == 'naive':
+        # Kausinaiivi: viimeisin havaittu arvo samalta viikonpäivältä ja tunnilta
+        observed = ~np.isnan(weeks)
+        last_observed = np.where(observed.any(axis=0), weeks.shape[0] - 1 - np.argmax(observed[::-1], axis=0), 0)
+        return weeks[last_observed, np.arange(HOURS_PER_WEEK)]
+    
+    # Eksponentiaalinen tasoitus jokaiselle viikkopaikalle suljetussa muodossa:
+    # painot alpha*(1-alpha)^k viikon iän k mukaan, normalisoituna havaittuihin arvoihin
+    ages = np.arange(weeks.shape[0] - 1, -1, -1)[:, np.newaxis]
+    weights = alpha * (1 - alpha) ** ages * ~np.isnan(weeks)
+    weight_sum = weights.sum(axis=0)
+    weighted = (weights * np.nan_to_num(weeks)).sum(axis=0)
+    return np.divide(weighted, weight_sum, out=np.full(HOURS_PER_WEEK, np.nan), where=weight_sum > 0)
+
+def forecast_hourly_volume(series, method='ses', alpha=0.3):
+    """Ennusta seuraavan viikon tuntikohtaiset incidentit process_data-muotoisena taulukkona"""
+    weeks = _weekly_matrix(series.values)
+    if len(weeks) == 0:
+        return None
+    
+    # Ennuste alkaa seuraavasta keskiyöstä, jotta jokainen ennustepäivä on kokonainen
+    next_hour = series.index[-1] + pd.Timedelta(hours=1)
+    start = next_hour.ceil('D')
+    offset = int((start - next_hour) / pd.Timedelta(hours=1))
+    
+    # Viikkopaikka i vastaa tuntia next_hour + i, joten sarja kierretään alkamaan keskiyöstä
+    forecast = np.round(np.roll(_forecast_next_week(weeks, method, alpha), -offset), 2)
+    timestamps = pd.date_range(start, periods=HOURS_PER_WEEK, freq='h')
+    workers = np.array([get_worker_count(hour) for hour in range(24)])
+    
+    forecast_df = pd.DataFrame({
+        'timestamp': timestamps,
+        'Hour': timestamps.hour,
+        'Incidents handled by agent': forecast,
+        'workers': workers[timestamps.hour],
+        'date': timestamps.normalize(),
+        'date_str': timestamps.strftime('%Y-%m-%d'),
+        'day_name': [FINNISH_WEEKDAYS_LONG[i] for i in timestamps.weekday],
+        'day': timestamps.day
+    })
+    forecast_df['incidents_per_worker'] = forecast_df['Incidents handled by agent'] / forecast_df['workers']
+    return forecast_df.dropna(subset=['Incidents handled by agent'])
+
+def backtest_forecast(series, method='ses', alpha=0.3):
+    """Laske ennusteen keskimääräinen absoluuttinen virhe viimeiselle täydelle viikolle"""
+    weeks = _weekly_matrix(series.values)
+    if len(weeks) < 2:
+        return None
+    
+    predicted = _forecast_next_week(weeks[:-1], method, alpha)
+    errors = np.abs(predicted - weeks[-1])
+    return float(np.nanmean(errors)) if np.isfinite(errors).any() else None
+
+# Poikkeamien tunnistus: yksittäisen tunnin raja sekä usean peräkkäisen tunnin yhdistetyn jakson raja
+ANOMALY_THRESHOLD = 3.5
+ANOMALY_DAY_THRESHOLD = 4.5
+ANOMALY_DAY_MIN_HOURS = 3
+ANOMALY_MIN_SAMPLES = 5
+
+def _scan_anomaly_segments(score, dates, hours, min_hours=ANOMALY_DAY_MIN_HOURS, threshold=ANOMALY_DAY_THRESHOLD):
+    """Etsi kunkin päivän voimakkain nouseva ja laskeva vähintään min_hours tunnin jakso"""
+    grid = pd.DataFrame({'date': dates, 'hour': hours, 'score': score}).pivot_table(
+        index='date', columns='hour', values='score', aggfunc='last'
+    ).reindex(columns=range(24)).fillna(0.0)
+    
+    # Jakson pistemäärä on tuntien pistemäärien summa jaettuna pituuden neliöjuurella
+    cumulative = np.hstack([np.zeros((len(grid), 1)), grid.values.cumsum(axis=1)])
+    starts, ends = np.triu_indices(25, k=min_hours)
+    segment_scores = (cumulative[:, ends] - cumulative[:, starts]) / np.sqrt(ends - starts)
+    
+    flags = np.zeros(grid.shape, dtype=bool)
+    for direction in (1, -1):
+        best = np.argmax(direction * segment_scores, axis=1)
+        best_scores = direction * segment_scores[np.arange(len(grid)), best]
+        for row in np.flatnonzero(best_scores >= threshold):
+            flags[row, starts[best[row]]:ends[best[row]]] = True
+    
+    segments = pd.DataFrame(flags, index=grid.index, columns=grid.columns).stack()
+    keys = pd.MultiIndex.from_arrays([dates, hours])
+    return segments.reindex(keys, fill_value=False).values
+
+@st.cache_data
+def detect_anomalies(df, threshold=ANOMALY_THRESHOLD):
+    """Merkitse poikkeavat tunnit robustilla (viikonpäivä, tunti) -perustasolla ja monen tunnin jaksot"""
+    result = df.copy()
+    incidents = result['Incidents handled by agent'].astype(float)
+    known = (result['day_name'] != 'Tuntematon').values
+    
+    # Ilman päivämääriä perustaso lasketaan pelkästään tunneittain
+    weekday = pd.to_datetime(result['date']).dt.weekday.where(result['day_name'] != 'Tuntematon', -1)
+    keys = [weekday.values, result['Hour'].astype(int).values]
+    
+    # Anscomben muunnos: Poisson-määrien hajonta on noin 1 tasosta riippumatta,
+    # joten myös pienten määrien nollatunnit erottuvat
+    transformed = 2 * np.sqrt(incidents.clip(lower=0) + 3 / 8)
+    baseline = transformed.groupby(keys).transform('median')
+    samples = transformed.groupby(keys).transform('count')
+    residual = transformed - baseline
+    
+    # Hajonta arvioidaan kaikista ryhmistä yhdessä (MAD), koska ryhmäkohtaisia havaintoja on vähän;
+    # mediaanin oma epävarmuus pienissä ryhmissä kasvattaa skaalaa
+    enough = samples >= ANOMALY_MIN_SAMPLES
+    pooled_mad = residual[enough].abs().median() if enough.any() else 0.0
+    scale = max(1.4826 * pooled_mad, 1.0) * np.sqrt(1 + np.pi / (2 * samples))
+    score = (residual / scale).where(enough, 0.0)
+    
+    segment = np.zeros(len(result), dtype=bool)
+    if known.any():
+        segment[known] = _scan_anomaly_segments(
+            score[known].values, result.loc[known, 'date_str'].values, result.loc[known, 'Hour'].astype(int).values
+        )
+    
+    result['baseline_median'] = incidents.groupby(keys).transform('median')
+    result['anomaly_score'] = score.round(2)
+    result['anomaly_segment'] = segment
+    result['is_anomaly'] = (score.abs() > threshold) | segment
+    result['anomaly_direction'] = np.where(score > 0, 'Korkea', 'Matala')
+    return result
+
+def calculate_daily_anomalies(anomaly_df):
+    """Laske poikkeavat tunnit päivittäin ja merkitse päivät, joilla poikkeama jatkuu useita tunteja"""
+    score = anomaly_df['anomaly_score']
+    segment = anomaly_df['anomaly_segment']
+    flags = pd.DataFrame({
+        'date': anomaly_df['date_str'],
+        'anomaly_hours': anomaly_df['is_anomaly'],
+        'high_hours': segment & (score > 0),
+        'low_hours': segment & (score < 0)
+    })
+    daily = flags.groupby('date').sum().astype(int)
+    
+    # Usean tunnin samansuuntainen poikkeama viittaa häiriöön, ei satunnaisvaihteluun
+    daily['anomaly_day'] = (
+        (daily['high_hours'] >= ANOMALY_DAY_MIN_HOURS) |
+        (daily['low_hours'] >= ANOMALY_DAY_MIN_HOURS)
+    )
+    return daily.reset_index()
+
+# Paikallinen historiatietokanta
+HISTORY_DB_PATH = os.environ.get("INCIDENT_HISTORY_DB", "incident_history.db")
+
+def _connect_history(db_path=HISTORY_DB_PATH):
+    """Avaa historiatietokanta ja luo taulut tarvittaessa"""
+    conn = sqlite3.connect(db_path, timeout=30)
+    # Perusavain (date, hour) poistaa päällekkäisyydet ja toimii päivämääräindeksinä
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS incidents (
+            date TEXT NOT NULL,
+            hour INTEGER NOT NULL,
+            incidents REAL NOT NULL,
+            PRIMARY KEY (date, hour)
+        ) WITHOUT ROWID
+    """)
+    # Päiväkohtaiset koosteet päivitetään vain muuttuneille päiville
+    has_aggregates = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'daily_aggregates'"
+    ).fetchone() is not None
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS daily_aggregates (
+            date TEXT PRIMARY KEY,
+            total_incidents REAL NOT NULL,
+            day_shift_avg REAL,
+            night_shift_avg REAL,
+            updated_at REAL NOT NULL
+        )
+    """)
+    if not has_aggregates:
+        # Ennen koosteita luotu tietokanta: lasketaan koosteet kerran koko historialle
+        first, last = conn.execute("SELECT MIN(date), MAX(date) FROM incidents").fetchone()
+        if first is not None:
+            _refresh_daily_aggregates(conn, first, last)
+        conn.commit()
+    # Tarkkailukansiosta tuodut tiedostot muokkausajan ja tiivisteen mukaan
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ingested_files (
+            path TEXT PRIMARY KEY,
+            mtime REAL NOT NULL,
+            sha256 TEXT NOT NULL,
+            ingested_at REAL NOT NULL
+        )
+    """)
+    return conn
+
+# Viikonpäivä SQLitessä (strftime %w: 0 = sunnuntai) muunnettuna muotoon 0 = maanantai
+SQL_WEEKDAY = "((CAST(strftime('%w', date) AS INTEGER) + 6) % 7)"
+
+def _staffing_cte():
+    """Muodosta työntekijämäärät SQL-taulukoksi, jotta laskenta pysyy get_worker_count-funktiossa"""
+    values = ", ".join(f"({hour}, {get_worker_count(hour)})" for hour in range(24))
+    return f"WITH staffing(hour, workers) AS (VALUES {values})"
+
+def store_history(df, db_path=HISTORY_DB_PATH):
+    """Tallenna käsitellyt rivit historiaan; sama (päivämäärä, tunti) korvaa aiemman arvon
+    
+    Palauttaa uusien tai muuttuneiden rivien määrän. Muuttumattomat päivät eivät päivitä
+    historian versiota, joten saman tiedoston uusi tallennus ei käynnistä näkymien päivitystä.
+    """
+    values = _profile_values(df)
+    if len(values) == 0:
+        return 0
+    
+    incoming = values.rename('incidents').reset_index()
+    with closing(_connect_history(db_path)) as conn, conn:
+        # Kirjoituslukko ennen vertailua, jotta rinnakkainen tallennus ei muuta rivejä välissä
+        conn.execute("BEGIN IMMEDIATE")
+        stored = pd.read_sql_query("""
+            SELECT date AS date_str, hour, incidents AS stored
+            FROM incidents
+            WHERE date BETWEEN ? AND ?
+        """, conn, params=(incoming['date_str'].min(), incoming['date_str'].max()))
+        
+        merged = incoming.merge(stored, on=['date_str', 'hour'], how='left')
+        changed = merged[merged['incidents'] != merged['stored']]
+        if len(changed) == 0:
+            return 0
+        
+        conn.executemany("""
+            INSERT INTO incidents (date, hour, incidents) VALUES (?, ?, ?)
+            ON CONFLICT (date, hour) DO UPDATE SET incidents = excluded.incidents
+        """, list(zip(changed['date_str'], changed['hour'].astype(int), changed['incidents'])))
+        
+        # Koosteet päivitetään vain muuttuneille päiville, yksi yhtenäinen päiväjakso kerrallaan
+        changed_dates = pd.to_datetime(pd.Series(changed['date_str'].unique())).sort_values()
+        run_id = (changed_dates.diff() != pd.Timedelta(days=1)).cumsum()
+        for _, run in changed_dates.groupby(run_id.values):
+            _refresh_daily_aggregates(conn, run.iloc[0].strftime('%Y-%m-%d'), run.iloc[-1].strftime('%Y-%m-%d'))
+    return len(changed)
+
+def _refresh_daily_aggregates(conn, start_date, end_date):
+    """Laske päiväkoosteet uudelleen vain annetulle aikavälille"""
+    # Versio kasvaa aina, vaikka kello ei etenisi; kirjoituslukko estää rinnakkaiset päivitykset
+    latest = conn.execute("SELECT MAX(updated_at) FROM daily_aggregates").fetchone()[0]
+    version = time.time() if latest is None else max(time.time(), latest + 0.001)
+    conn.execute(f"""
+        {_staffing_cte()}
+        INSERT OR REPLACE INTO daily_aggregates (date, total_incidents, day_shift_avg, night_shift_avg, updated_at)
+        SELECT
+            date,
+            SUM(incidents),
+            AVG(CASE WHEN hour >= 7 AND hour < 23 THEN incidents / workers END),
+            AVG(CASE WHEN hour >= 23 OR hour < 7 THEN incidents / workers END),
+            ?
+        FROM incidents JOIN staffing USING (hour)
+        WHERE date BETWEEN ? AND ?
+        GROUP BY date
+    """, (version, str(start_date), str(end_date)))
+
+def get_history_version(db_path=HISTORY_DB_PATH):
+    """Palauta historian versio, joka muuttuu aina kun dataa tallennetaan"""
+    with closing(_connect_history(db_path)) as conn:
+        return conn.execute("SELECT MAX(updated_at) FROM daily_aggregates").fetchone()[0]
+
+def get_changed_dates(since_version, db_path=HISTORY_DB_PATH):
+    """Palauta päivämäärät, joiden koosteet ovat muuttuneet annetun version jälkeen"""
+    with closing(_connect_history(db_path)) as conn:
+        rows = conn.execute(
+            "SELECT date FROM daily_aggregates WHERE updated_at > ? ORDER BY date", (since_version,)
+        ).fetchall()
+    return [date for (date,) in rows]
+
+def get_history_range(db_path=HISTORY_DB_PATH):
+    """Palauta historian ensimmäinen ja viimeinen päivämäärä sekä rivimäärä"""
+    with closing(_connect_history(db_path)) as conn:
+        first, last, count = conn.execute("SELECT MIN(date), MAX(date), COUNT(*) FROM incidents").fetchone()
+    if count == 0:
+        return None
+    return pd.to_datetime(first).date(), pd.to_datetime(last).date(), count
+
+def load_history_rows(start_date, end_date, db_path=HISTORY_DB_PATH):
+    """Lataa valitun aikavälin rivit Excel-tiedoston muodossa process_data-käsittelyä varten"""
+    with closing(_connect_history(db_path)) as conn:
+        return pd.read_sql_query("""
+            SELECT date AS "Date", hour AS "Hour", incidents AS "Incidents handled by agent"
+            FROM incidents
+            WHERE date BETWEEN ? AND ?
+            ORDER BY date, hour
+        """, conn, params=(str(start_date), str(end_date)))
+
+def query_hourly_stats(start_date, end_date, db_path=HISTORY_DB_PATH):
+    """Laske calculate_hourly_stats-muotoiset tuntitilastot tietokannassa"""
+    with closing(_connect_history(db_path)) as conn:
+        hourly = pd.read_sql_query("""
+            SELECT hour, AVG(incidents) AS avg_incidents, COUNT(*) AS days_count
+            FROM incidents
+            WHERE date BETWEEN ? AND ?
+            GROUP BY hour
+            ORDER BY hour
+        """, conn, params=(str(start_date), str(end_date)))
+    
+    hourly['worker_count'] = hourly['hour'].apply(get_worker_count)
+    hourly['incidents_per_worker'] = (hourly['avg_incidents'] / hourly['worker_count']).round(2)
+    hourly['avg_incidents'] = hourly['avg_incidents'].round(2)
+    hourly['hour_str'] = hourly['hour'].apply(lambda hour: f"{hour:02d}:00")
+    return hourly[['hour', 'hour_str', 'avg_incidents', 'worker_count', 'incidents_per_worker', 'days_count']]
+
+def query_daily_stats(start_date, end_date, db_path=HISTORY_DB_PATH):
+    """Hae calculate_daily_stats-muotoiset päivätilastot tietokannan päiväkoosteista"""
+    with closing(_connect_history(db_path)) as conn:
+        daily = pd.read_sql_query("""
+            SELECT date, total_incidents, day_shift_avg, night_shift_avg
+            FROM daily_aggregates
+            WHERE date BETWEEN ? AND ?
+            ORDER BY date
+        """, conn, params=(str(start_date), str(end_date)))
+    
+    dates = pd.to_datetime(daily['date'])
+    daily['day_name'] = dates.apply(get_finnish_weekday)
+    daily['day'] = dates.dt.day
+    daily['day_shift_avg'] = daily['day_shift_avg'].fillna(0)
+    daily['night_shift_avg'] = daily['night_shift_avg'].fillna(0)
+    daily['day_target_met'] = daily['day_shift_avg'] >= 5.1
+    daily['night_target_met'] = daily['night_shift_avg'] >= 4.6
+    daily['day_shift_avg'] = daily['day_shift_avg'].round(2)
+    daily['night_shift_avg'] = daily['night_shift_avg'].round(2)
+    return daily[['date', 'day_name', 'day', 'total_incidents', 'day_shift_avg', 'night_shift_avg', 'day_target_met', 'night_target_met']]
+
+def query_shift_averages(start_date, end_date, db_path=HISTORY_DB_PATH):
+    """Laske päivä- ja yövuoron keskimääräiset incidentit per työntekijä tietokannassa"""
+    with closing(_connect_history(db_path)) as conn:
+        day_avg, night_avg = conn.execute(f"""
+            {_staffing_cte()}
+            SELECT
+                AVG(CASE WHEN hour >= 7 AND hour < 23 THEN incidents / workers END),
+                AVG(CASE WHEN hour >= 23 OR hour < 7 THEN incidents / workers END)
+            FROM incidents JOIN staffing USING (hour)
+            WHERE date BETWEEN ? AND ?
+        """, (str(start_date), str(end_date))).fetchone()
+    return day_avg or 0, night_avg or 0
+
+def query_load_profile(start_date, end_date, db_path=HISTORY_DB_PATH):
+    """Laske build_load_profile-muotoinen viikonpäivä × tunti -profiili tietokannassa"""
+    with closing(_connect_history(db_path)) as conn:
+        cells = pd.read_sql_query(f"""
+            SELECT {SQL_WEEKDAY} AS weekday, hour, SUM(incidents) AS sum, COUNT(*) AS count
+            FROM incidents
+            WHERE date BETWEEN ? AND ?
+            GROUP BY weekday, hour
+        """, conn, params=(str(start_date), str(end_date)))
+    
+    return {
+        agg: cells.pivot(index='weekday', columns='hour', values=agg)
+                  .reindex(index=range(7), columns=range(24), fill_value=0).fillna(0).astype(float)
+        for agg in ['sum', 'count']
+    }
+
+def query_history_cell(start_date, end_date, weekday, hour, db_path=HISTORY_DB_PATH):
+    """Hae yhden viikonpäivän ja tunnin päiväkohtaiset rivit aikaväliltä"""
+    with closing(_connect_history(db_path)) as conn:
+        cell = pd.read_sql_query(f"""
+            SELECT date AS date_str, incidents AS "Incidents handled by agent"
+            FROM incidents
+            WHERE hour = ? AND {SQL_WEEKDAY} = ? AND date BETWEEN ? AND ?
+            ORDER BY date
+        """, conn, params=(int(hour), int(weekday), str(start_date), str(end_date)))
+    
+    cell['workers'] = get_worker_count(hour)
+    cell['incidents_per_worker'] = cell['Incidents handled by agent'] / cell['workers']
+    return cell
+
+# Tarkkailukansion automaattinen tuonti
+WATCH_DIR = os.environ.get("INCIDENT_WATCH_DIR", "")
+WATCH_INTERVAL_SECONDS = 10
+WATCH_FILE_TYPES = ('.xlsx', '.xls')
+
+def _file_digest(path):
+    """Laske tiedoston SHA-256-tiiviste paloittain"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def ingest_watch_folder(folder, db_path=HISTORY_DB_PATH):
+    """Tuo kansiosta historiaan vain uudet tai muuttuneet Excel-tiedostot
+    
+    Palauttaa tuotujen tiedostojen nimet sekä luettavaksi kelpaamattomat tiedostot virheineen.
+    """
+    with closing(_connect_history(db_path)) as conn:
+        known_files = {
+            path: (mtime, sha256)
+            for path, mtime, sha256 in conn.execute("SELECT path, mtime, sha256 FROM ingested_files")
+        }
+    
+    ingested = []
+    failed = {}
+    for entry in sorted(os.scandir(folder), key=lambda e: e.name):
+        if not entry.is_file() or not entry.name.lower().endswith(WATCH_FILE_TYPES):
+            continue
+        
+        path = os.path.abspath(entry.path)
+        mtime = entry.stat().st_mtime
+        known_mtime, known_sha256 = known_files.get(path, (None, None))
+        if known_mtime == mtime:
+            continue
+        
+        # Muokkausaika muuttui: tiiviste kertoo, muuttuiko sisältö oikeasti
+        sha256 = _file_digest(path)
+        if sha256 != known_sha256:
+            try:
+                df = pd.read_excel(path)
+            except Exception as e:
+                # Virheellinen tiedosto kirjataan, jotta sitä ei lueta uudelleen joka kierroksella;
+                # kesken jäänyt kirjoitus saa valmistuessaan uuden muokkausajan ja luetaan silloin
+                failed[entry.name] = str(e)
+            else:
+                processed_df = process_data(df)
+                if processed_df is not None:
+                    store_history(processed_df, db_path)
+                    ingested.append(entry.name)
+        
+        with closing(_connect_history(db_path)) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO ingested_files (path, mtime, sha256, ingested_at) VALUES (?, ?, ?, ?)",
+                (path, mtime, sha256, time.time())
+            )
+    
+    return ingested, failed
+
+@st.fragment(run_every=WATCH_INTERVAL_SECONDS)
+def watch_folder_monitor(folder):
+    """Tarkkaile kansiota ja päivitä näkymä, kun historiaan tulee uutta dataa"""
+    try:
+        ingested, failed = ingest_watch_folder(folder)
+    except Exception as e:
+        st.error(f"Virhe kansion tarkkailussa: {str(e)}")
+        return
+    
+    if ingested:
+        st.toast(f"📥 Tuotu: {', '.join(ingested)}")
+    
+    # Virheelliset tiedostot näytetään, kunnes ne tuodaan onnistuneesti
+    watch_failures = st.session_state.setdefault('watch_failures', {})
+    watch_failures.update(failed)
+    for name in ingested:
+        watch_failures.pop(name, None)
+    for name, error in watch_failures.items():
+        st.warning(f"⚠️ Tiedostoa {name} ei voitu lukea: {error}")
+    
+    # Versio muuttuu myös, kun toinen istunto tuo datan, joten kaikki avoimet näkymät päivittyvät
+    version = get_history_version()
+    previous_version = st.session_state.get('history_version')
+    st.session_state['history_version'] = version
+    if previous_version is not None and previous_version != version:
+        st.rerun()
+    
+    st.caption(f"🔄 Tarkkaillaan kansiota {folder} – tarkistettu {datetime.now():%H:%M:%S}")
+
+# Istuntojen välinen jaettu tulosvälimuisti (0 poistaa tallennuksen käytöstä)
+RESULT_CACHE_MAX_BYTES = int(float(os.environ.get("INCIDENT_CACHE_MAX_MB", "512")) * 1024 * 1024)
+RESULT_CACHE_CONFIG = (tuple(get_worker_count(hour) for hour in range(24)), 5.1, 4.6)
+
+def _to_arrow(df):
+    """Muunna DataFrame Arrow-taulukoksi; sekatyyppiset sarakkeet tallennetaan tekstinä"""
+    # Indeksi ja sarakeotsikot (esim. profiilin viikonpäivä × tunti) palautuvat metatiedoista
+    # alkuperäisinä; RangeIndex tallennetaan pelkkänä metatietona ilman lisäsaraketta
+    try:
+        return pa.Table.from_pandas(df, preserve_index=None)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        mixed = {col: df[col].astype(str) for col in df.columns if df[col].dtype == object}
+        return pa.Table.from_pandas(df.assign(**mixed), preserve_index=None)
+
+def _pack_result(value):
+    """Muunna tuloksen DataFramet (myös sisäkkäisissä sanakirjoissa) Arrow-taulukoiksi"""
+    if isinstance(value, pd.DataFrame):
+        return _to_arrow(value)
+    if isinstance(value, dict):
+        return {name: _pack_result(item) for name, item in value.items()}
+    return value
+
+def _unpack_result(value):
+    """Muunna tallennetut Arrow-taulukot takaisin DataFrameiksi"""
+    # Numeeriset sarakkeet jaetaan istuntojen kesken kopioimatta Arrow-puskureista
+    if isinstance(value, pa.Table):
+        return value.to_pandas(split_blocks=True)
+    if isinstance(value, dict):
+        return {name: _unpack_result(item) for name, item in value.items()}
+    return value
+
+def _result_nbytes(value):
+    """Laske tuloksen Arrow-taulukoiden koko tavuina"""
+    if isinstance(value, pa.Table):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(_result_nbytes(item) for item in value.values())
+    return 0
+
+class SharedResultCache:
+    """Istuntojen yhteinen LRU-välimuisti, joka säilyttää taulukot Arrow-muodossa muistirajan sisällä"""
+    
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return entry[0]
+        return None
+    
+    def _insert(self, key, values):
+        size = _result_nbytes(values)
+        if size > self.max_bytes:
+            return
+        # Poista vähiten viime aikoina käytetyt, kunnes uusi tulos mahtuu
+        while self._entries and self.total_bytes + size > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.total_bytes -= evicted_size
+        self._entries[key] = (values, size)
+        self.total_bytes += size
+    
+    def get_or_compute(self, key, compute):
+        """Palauta avaimen tulokset; samanaikaiset pyynnöt samalle avaimelle laskevat sen vain kerran
+        
+        Palautettujen DataFramejen numeeriset sarakkeet ovat vain luku -näkymiä jaettuihin
+        Arrow-puskureihin: arvojen muokkaus paikallaan (esim. .loc-sijoitus) nostaa ValueErrorin,
+        joten kutsujan on tehtävä ensin .copy(). Uusien sarakkeiden lisääminen on sallittua.
+        """
+        with self._lock:
+            values = self._lookup(key)
+            if values is None:
+                key_lock = self._key_locks.setdefault(key, threading.Lock())
+        
+        if values is None:
+            try:
+                with key_lock:
+                    with self._lock:
+                        values = self._lookup(key)
+                    if values is None:
+                        values = _pack_result(compute())
+                        # Epäonnistunutta käsittelyä ei tallenneta, jotta virheilmoitus näkyy jokaiselle
+                        if all(value is not None for value in values.values()):
+                            with self._lock:
+                                self._insert(key, values)
+            finally:
+                # Poista vain oma lukko: odottanut pyyntö on voinut jo luoda avaimelle uuden
+                with self._lock:
+                    if self._key_locks.get(key) is key_lock:
+                        del self._key_locks[key]
+        
+        return _unpack_result(values)
+
+@st.cache_resource
+def get_shared_result_cache():
+    """Palauta prosessin kaikille istunnoille yhteinen tulosvälimuisti"""
+    return SharedResultCache(RESULT_CACHE_MAX_BYTES)
+
+def compute_upload_results(file_bytes):
+    """Lue ja käsittele ladattu Excel-tiedosto sekä laske sen analyysinäkymät"""
+    df = pd.read_excel(io.BytesIO(file_bytes))
+    # Ohitetaan st.cache_data, jotta käsitelty data on muistissa vain jaetussa välimuistissa
+    processed_df = process_data.__wrapped__(df)
+    
+    return {
+        'raw_rows': len(df),
+        'raw_preview': df.head(10),
+        'raw_dtypes': {col: str(df[col].dtype) for col in df.columns},
+        'views': build_upload_views(processed_df) if processed_df is not None else None
+    }
+
+# Historianäkymässä tuntirivit ladataan vain poikkeamien ja ennusteen tarvitsemalta jaksolta
+HISTORY_DETAIL_WEEKS = 8
+
+def calculate_shift_averages(df):
+    """Laske päivä- ja yövuoron keskimääräiset incidentit per työntekijä"""
+    day_shift_data = df[(df['Hour'] >= 7) & (df['Hour'] < 23)]
+    night_shift_data = df[(df['Hour'] >= 23) | (df['Hour'] < 7)]
+    
+    day_avg = day_shift_data['incidents_per_worker'].mean() if len(day_shift_data) > 0 else 0
+    night_avg = night_shift_data['incidents_per_worker'].mean() if len(night_shift_data) > 0 else 0
+    return day_avg, night_avg
+
+def _merge_daily_anomalies(daily_stats, daily_anomalies):
+    """Liitä poikkeamatiedot päivätilastoihin; päivät ilman tuntitietoja eivät ole poikkeavia"""
+    merged = daily_stats.merge(daily_anomalies, on='date', how='left', indicator=True)
+    # Historiassa poikkeamat lasketaan vain rajatulta jaksolta; muita päiviä ei ole tarkistettu
+    merged['anomaly_checked'] = merged.pop('_merge').eq('both')
+    for col in ['anomaly_hours', 'high_hours', 'low_hours']:
+        merged[col] = merged[col].fillna(0).astype(int)
+    merged['anomaly_day'] = merged['anomaly_day'].eq(True)
+    return merged
+
+def build_upload_views(processed_df):
+    """Kokoa analyysinäkymien tiedot ladatun tiedoston käsitellystä datasta"""
+    # Tulokset tallennetaan jaettuun välimuistiin, joten st.cache_data ohitetaan
+    anomaly_df = detect_anomalies.__wrapped__(processed_df)
+    load_profile = build_load_profile.__wrapped__(processed_df)
+    daily_anomalies = calculate_daily_anomalies(anomaly_df)
+    daily_stats = calculate_daily_stats(processed_df)
+    day_avg, night_avg = calculate_shift_averages(processed_df)
+    
+    return {
+        'detail': anomaly_df,
+        'detail_start': None,
+        'history_range': None,
+        'hourly': calculate_hourly_stats(processed_df),
+        'daily': _merge_daily_anomalies(daily_stats, daily_anomalies),
+        'daily_anomalies': daily_anomalies,
+        'trend': calculate_trend_stats(daily_stats),
+        'profile': {agg: load_profile[agg] for agg in ['sum', 'count']},
+        'day_avg': day_avg,
+        'night_avg': night_avg
+    }
+
+def build_history_views(start_date, end_date, trend_stats=None, load_profile=None, db_path=HISTORY_DB_PATH):
+    """Kokoa historian aikavälin näkymät SQL-koosteista ja rajatusta tuntidatajaksosta"""
+    daily_stats = query_daily_stats(start_date, end_date, db_path)
+    day_avg, night_avg = query_shift_averages(start_date, end_date, db_path)
+    
+    # Koko aikaväliä ei ladata pandasiin: poikkeamat ja ennuste lasketaan viimeisiltä viikoilta
+    detail_start = max(start_date, end_date - timedelta(weeks=HISTORY_DETAIL_WEEKS) + timedelta(days=1))
+    detail_rows = load_history_rows(detail_start, end_date, db_path)
+    processed_df = process_data(detail_rows) if len(detail_rows) > 0 else None
+    
+    if processed_df is not None:
+        anomaly_df = detect_anomalies(processed_df)
+        daily_anomalies = calculate_daily_anomalies(anomaly_df)
+    else:
+        anomaly_df = None
+        daily_anomalies = pd.DataFrame(columns=['date', 'anomaly_hours', 'high_hours', 'low_hours', 'anomaly_day'])
+    
+    return {
+        'detail': anomaly_df,
+        'detail_start': detail_start,
+        'history_range': (start_date, end_date),
+        'hourly': query_hourly_stats(start_date, end_date, db_path),
+        'daily': _merge_daily_anomalies(daily_stats, daily_anomalies),
+        'daily_anomalies': daily_anomalies,
+        'trend': trend_stats if trend_stats is not None else calculate_trend_stats(daily_stats),
+        'profile': load_profile if load_profile is not None else query_load_profile(start_date, end_date, db_path),
+        'day_avg': day_avg,
+        'night_avg': night_avg
+    }
+
 def create_combined_chart(hourly_df):
     """Luo yhdistetty kaavio paremmilla tooltip-näkymillä"""
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+    
     fig = make_subplots(
         rows=1, cols=1,
         specs=[[{"secondary_y": True}]],
@@ -395,6 +1296,667 @@ def create_combined_chart(hourly_df):
     
     return fig
 
+def render_dashboard(views):
+    """Näytä analyysinäkymät build_upload_views- tai build_history_views-tiedoista"""
+    # Piirtokirjastot ladataan vasta, kun analyysinäkymä näytetään ensimmäisen kerran
+    import plotly.express as px
+    import plotly.graph_objects as go
+    
+    hourly_stats = views['hourly']
+    daily_stats = views['daily']
+    trend_stats = views['trend']
+    load_profile = views['profile']
+    
+    # Poikkeamat: tuntirivit ja päivät (historiassa vain viimeisiltä viikoilta)
+    anomaly_df = views['detail']
+    daily_anomalies = views['daily_anomalies']
+    
+    # Tuottavuustavoitteiden analyysi
+    day_avg = views['day_avg']
+    night_avg = views['night_avg']
+    
+    # Tulosten näyttäminen
+    st.header("🎯 Tuottavuustavoitteiden tulokset")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        day_status = "✅ SAAVUTETTU" if day_avg >= 5.1 else "❌ EI SAAVUTETTU"
+        day_color = "green" if day_avg >= 5.1 else "red"
+        st.markdown(f"""
+        <div style="padding: 20px; border: 2px solid {day_color}; border-radius: 10px; background-color: {'lightgreen' if day_avg >= 5.1 else 'lightcoral'};">
+            <h3>🌅 Päivätyöntekijät (07-23)</h3>
+            <p><strong>Keskiarvo:</strong> {day_avg:.2f} inc/työnt./h</p>
+            <p><strong>Tavoite:</strong> ≥5.1 inc/työnt./h</p>
+            <p><strong>Tulos:</strong> {day_status}</p>
+            <p><strong>Ero:</strong> {day_avg - 5.1:+.2f}</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col2:
+        night_status = "✅ SAAVUTETTU" if night_avg >= 4.6 else "❌ EI SAAVUTETTU"
+        night_color = "green" if night_avg >= 4.6 else "red"
+        st.markdown(f"""
+        <div style="padding: 20px; border: 2px solid {night_color}; border-radius: 10px; background-color: {'lightgreen' if night_avg >= 4.6 else 'lightcoral'};">
+            <h3>🌙 Yötyöntekijät (23-07)</h3>
+            <p><strong>Keskiarvo:</strong> {night_avg:.2f} inc/työnt./h</p>
+            <p><strong>Tavoite:</strong> ≥4.6 inc/työnt./h</p>
+            <p><strong>Tulos:</strong> {night_status}</p>
+            <p><strong>Ero:</strong> {night_avg - 4.6:+.2f}</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    # Välilehdet eri näkymille
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs([
+        "📊 Yhdistetty näkymä", 
+        "📈 Tuntikohtainen analyysi", 
+        "📅 Kuukausinäkymä",
+        "📋 Yksityiskohtaiset tilastot",
+        "💡 Suositukset",
+        "🗓️ Viikkoprofiili",
+        "🔮 Ennuste"
+    ])
+    
+    with tab1:
+        st.subheader("Yhdistetty analyysi")
+        if len(hourly_stats) > 0:
+            try:
+                fig_combined = create_combined_chart(hourly_stats)
+                st.plotly_chart(fig_combined, use_container_width=True)
+            except Exception as e:
+                st.error(f"Virhe kaavion luonnissa: {str(e)}")
+                st.info("Näytetään data taulukkona:")
+                st.dataframe(hourly_stats)
+        else:
+            st.warning("Ei dataa kaavion piirtämiseen.")
+    
+    with tab2:
+        st.subheader("Tuntikohtainen analyysi")
+        
+        if len(hourly_stats) > 0:
+            # Valitse näkymä
+            chart_type = st.selectbox(
+                "Valitse näkymä:",
+                ["Incidentit/työntekijä", "Kokonaisincidentit", "Työntekijämäärät"]
+            )
+            
+            try:
+                if chart_type == "Incidentit/työntekijä":
+                    fig = px.line(
+                        hourly_stats, 
+                        x='hour_str', 
+                        y='incidents_per_worker',
+                        title='Incidentit per työntekijä tunnissa',
+                        markers=True,
+                        hover_data={
+                            'hour_str': False,
+                            'incidents_per_worker': ':.2f',
+                            'worker_count': True,
+                            'avg_incidents': ':.2f'
+                        }
+                    )
+                    fig.update_traces(
+                        hovertemplate='<b>Kelloaika:</b> %{x}<br>' +
+                                     '<b>Incidentit/työntekijä:</b> %{y:.2f}<br>' +
+                                     '<b>Työntekijämäärä:</b> %{customdata[0]}<br>' +
+                                     '<b>Keskimääräiset incidentit:</b> %{customdata[1]:.2f}<br>' +
+                                     '<extra></extra>',
+                        customdata=hourly_stats[['worker_count', 'avg_incidents']].values
+                    )
+                    fig.add_hline(y=5.1, line_dash="dash", line_color="red", 
+                                 annotation_text="Päivätyöntekijöiden tavoite (5.1)")
+                    fig.add_hline(y=4.6, line_dash="dash", line_color="blue", 
+                                 annotation_text="Yötyöntekijöiden tavoite (4.6)")
+                
+                elif chart_type == "Kokonaisincidentit":
+                    fig = px.bar(
+                        hourly_stats, 
+                        x='hour_str', 
+                        y='avg_incidents',
+                        title='Keskimääräiset incidentit tunneittain',
+                        hover_data={
+                            'hour_str': False,
+                            'avg_incidents': ':.2f',
+                            'worker_count': True,
+                            'incidents_per_worker': ':.2f'
+                        }
+                    )
+                    fig.update_traces(
+                        hovertemplate='<b>Kelloaika:</b> %{x}<br>' +
+                                     '<b>Keskimääräiset incidentit:</b> %{y:.2f}<br>' +
+                                     '<b>Työntekijämäärä:</b> %{customdata[0]}<br>' +
+                                     '<b>Incidentit/työntekijä:</b> %{customdata[1]:.2f}<br>' +
+                                     '<extra></extra>',
+                        customdata=hourly_stats[['worker_count', 'incidents_per_worker']].values
+                    )
+                
+                else:  # Työntekijämäärät
+                    fig = px.bar(
+                        hourly_stats, 
+                        x='hour_str', 
+                        y='worker_count',
+                        title='Työntekijämäärät tunneittain',
+                        hover_data={
+                            'hour_str': False,
+                            'worker_count': True,
+                            'avg_incidents': ':.2f',
+                            'incidents_per_worker': ':.2f'
+                        }
+                    )
+                    fig.update_traces(
+                        hovertemplate='<b>Kelloaika:</b> %{x}<br>' +
+                                     '<b>Työntekijämäärä:</b> %{y}<br>' +
+                                     '<b>Keskimääräiset incidentit:</b> %{customdata[0]:.2f}<br>' +
+                                     '<b>Incidentit/työntekijä:</b> %{customdata[1]:.2f}<br>' +
+                                     '<extra></extra>',
+                        customdata=hourly_stats[['avg_incidents', 'incidents_per_worker']].values
+                    )
+                
+                # Yhteinen hover-tyyli kaikille kaavioille
+                fig.update_layout(
+                    height=500,
+                    hovermode='x unified',
+                    hoverlabel=dict(
+                        bgcolor="white",
+                        font_size=14,
+                        font_family="Arial",
+                        bordercolor="gray"
+                    )
+                )
+                st.plotly_chart(fig, use_container_width=True)
+                
+            except Exception as e:
+                st.error(f"Virhe kaavion luonnissa: {str(e)}")
+                st.info("Näytetään data taulukkona:")
+                st.dataframe(hourly_stats)
+        else:
+            st.warning("Ei dataa kaavion piirtämiseen.")
+    
+    with tab3:
+        st.subheader("📅 Kuukausinäkymä")
+        if views['detail_start'] is not None:
+            st.caption(f"Poikkeamat on tarkistettu vain {views['detail_start']} alkaen; aiemmat päivät on merkitty tarkistamattomiksi.")
+        
+        if len(daily_stats) >= 1:
+            # Luo kalenterinäkymä
+            try:
+                calendar_html = create_calendar_view(daily_stats)
+                if calendar_html:
+                    # Käytä korkeampaa height-arvoa jotta koko kalenteri mahtuu
+                    import streamlit.components.v1 as components
+                    components.html(calendar_html, height=900, scrolling=True)
+                else:
+                    st.warning("Kalenterin luonti epäonnistui.")
+            except Exception as e:
+                st.error(f"Virhe kalenterin luonnissa: {str(e)}")
+                st.info("Näytetään data taulukkona:")
+                st.dataframe(daily_stats)
+            
+            # Kuukausistatistiikat
+            st.subheader("📊 Kuukauden yhteenveto")
+            col1, col2, col3, col4 = st.columns(4)
+            
+            day_target_met = len(daily_stats[daily_stats['day_target_met']]) 
+            night_target_met = len(daily_stats[daily_stats['night_target_met']])
+            total_days = len(daily_stats)
+            
+            with col1:
+                st.metric("Päivätyöntekijät", f"{day_target_met}/{total_days}", f"{day_target_met/total_days*100:.1f}%")
+            with col2:
+                st.metric("Yötyöntekijät", f"{night_target_met}/{total_days}", f"{night_target_met/total_days*100:.1f}%")
+            with col3:
+                max_day = daily_stats.loc[daily_stats['total_incidents'].idxmax()]
+                st.metric("Kiireisin päivä", f"{max_day['day']:.0f}. ({max_day['day_name']})", f"{max_day['total_incidents']:.0f} inc")
+            with col4:
+                min_day = daily_stats.loc[daily_stats['total_incidents'].idxmin()]
+                st.metric("Rauhallisin päivä", f"{min_day['day']:.0f}. ({min_day['day_name']})", f"{min_day['total_incidents']:.0f} inc")
+            
+            # Päivittäinen kehitys
+            try:
+                fig_daily = px.line(
+                    daily_stats, 
+                    x='date', 
+                    y=['day_shift_avg', 'night_shift_avg'],
+                    title='Päivittäinen kehitys',
+                    labels={
+                        'value': 'Inc/työnt./h', 
+                        'variable': 'Vuoro',
+                        'date': 'Päivämäärä'
+                    },
+                    hover_data={
+                        'date': False,
+                        'value': ':.2f'
+                    }
+                )
+                
+                # Muuta legendan nimet suomeksi ja paranna tooltip
+                fig_daily.for_each_trace(
+                    lambda t: t.update(
+                        name='Päivätyöntekijät' if 'day_shift_avg' in t.name else 'Yötyöntekijät',
+                        hovertemplate='<b>Päivämäärä:</b> %{x}<br>' +
+                                     '<b>' + ('Päivätyöntekijät' if 'day_shift_avg' in t.name else 'Yötyöntekijät') + ':</b> %{y:.2f}<br>' +
+                                     '<extra></extra>'
+                    )
+                )
+                
+                fig_daily.add_hline(y=5.1, line_dash="dash", line_color="red", 
+                                  annotation_text="Päivätyöntekijöiden tavoite (5.1)")
+                fig_daily.add_hline(y=4.6, line_dash="dash", line_color="blue", 
+                                  annotation_text="Yötyöntekijöiden tavoite (4.6)")
+                
+                fig_daily.update_layout(
+                    hovermode='x unified',
+                    hoverlabel=dict(
+                        bgcolor="white",
+                        font_size=14,
+                        font_family="Arial",
+                        bordercolor="gray"
+                    )
+                )
+                st.plotly_chart(fig_daily, use_container_width=True)
+            except Exception as e:
+                st.error(f"Virhe päivittäisen kehityksen kaavion luonnissa: {str(e)}")
+                st.info("Näytetään data taulukkona:")
+                st.dataframe(daily_stats[['date', 'day_shift_avg', 'night_shift_avg']])
+            
+            if len(trend_stats) > 0:
+                # Trendit: liukuvat keskiarvot, viikkomuutokset ja tavoiteputket
+                st.subheader("📈 Trendit")
+                latest = trend_stats.iloc[-1]
+                col1, col2, col3, col4 = st.columns(4)
+            
+                with col1:
+                    day_wow = latest['day_shift_avg_wow']
+                    st.metric("Päivä, 7 pv keskiarvo", f"{latest['day_shift_avg_7d']:.2f}",
+                              f"{day_wow:+.2f} vs. edell. viikko" if pd.notna(day_wow) else None)
+                with col2:
+                    night_wow = latest['night_shift_avg_wow']
+                    st.metric("Yö, 7 pv keskiarvo", f"{latest['night_shift_avg_7d']:.2f}",
+                              f"{night_wow:+.2f} vs. edell. viikko" if pd.notna(night_wow) else None)
+                with col3:
+                    st.metric("Päivätavoite putkeen", f"{latest['day_streak']} pv", f"Pisin {trend_stats['day_streak'].max()} pv", delta_color="off")
+                with col4:
+                    st.metric("Yötavoite putkeen", f"{latest['night_streak']} pv", f"Pisin {trend_stats['night_streak'].max()} pv", delta_color="off")
+            
+                try:
+                    trend_names = {
+                        'day_shift_avg_7d': 'Päivä 7 pv',
+                        'day_shift_avg_28d': 'Päivä 28 pv',
+                        'night_shift_avg_7d': 'Yö 7 pv',
+                        'night_shift_avg_28d': 'Yö 28 pv'
+                    }
+                    fig_trend = px.line(
+                        trend_stats,
+                        x='date',
+                        y=list(trend_names.keys()),
+                        title='Liukuvat keskiarvot',
+                        labels={
+                            'value': 'Inc/työnt./h',
+                            'variable': 'Ikkuna',
+                            'date': 'Päivämäärä'
+                        }
+                    )
+                    fig_trend.for_each_trace(
+                        lambda t: t.update(
+                            name=trend_names[t.name],
+                            hovertemplate='<b>Päivämäärä:</b> %{x}<br>' +
+                                         '<b>' + trend_names[t.name] + ':</b> %{y:.2f}<br>' +
+                                         '<extra></extra>'
+                        )
+                    )
+                    fig_trend.add_hline(y=5.1, line_dash="dash", line_color="red", 
+                                      annotation_text="Päivätyöntekijöiden tavoite (5.1)")
+                    fig_trend.add_hline(y=4.6, line_dash="dash", line_color="blue", 
+                                      annotation_text="Yötyöntekijöiden tavoite (4.6)")
+                    fig_trend.update_layout(hovermode='x unified')
+                    st.plotly_chart(fig_trend, use_container_width=True)
+                except Exception as e:
+                    st.error(f"Virhe trendikaavion luonnissa: {str(e)}")
+                    st.dataframe(trend_stats)
+            
+            # Päivittäinen taulukko
+            st.subheader("📋 Päivittäiset tulokset")
+            daily_display = daily_stats.copy()
+            daily_display['Päivätyöntekijät'] = daily_display.apply(
+                lambda x: f"{x['day_shift_avg']:.2f} {'✅' if x['day_target_met'] else '❌'}", axis=1
+            )
+            daily_display['Yötyöntekijät'] = daily_display.apply(
+                lambda x: f"{x['night_shift_avg']:.2f} {'✅' if x['night_target_met'] else '❌'}", axis=1
+            )
+            
+            st.dataframe(
+                daily_display[['date', 'day_name', 'total_incidents', 'Päivätyöntekijät', 'Yötyöntekijät']],
+                column_config={
+                    'date': 'Päivämäärä',
+                    'day_name': 'Viikonpäivä',
+                    'total_incidents': 'Yhteensä inc.',
+                    'Päivätyöntekijät': 'Päivätyöntekijät',
+                    'Yötyöntekijät': 'Yötyöntekijät'
+                },
+                use_container_width=True
+            )
+        else:
+            st.info("Kuukausinäkymä vaatii vähintään yhden päivän dataa.")
+    
+    with tab4:
+        st.subheader("Tuntikohtaiset tilastot")
+        if len(hourly_stats) > 0:
+            st.dataframe(
+                hourly_stats,
+                column_config={
+                    'hour_str': 'Kelloaika',
+                    'avg_incidents': 'Keskim. incidentit',
+                    'worker_count': 'Työntekijämäärä',
+                    'incidents_per_worker': 'Inc/työnt./h',
+                    'days_count': 'Päivien lukumäärä'
+                },
+                use_container_width=True
+            )
+        else:
+            st.warning("Ei tilastoja näytettäväksi.")
+        
+        st.subheader("⚠️ Poikkeamat")
+        if views['detail_start'] is not None:
+            st.caption(f"Poikkeamat lasketaan viimeisiltä {HISTORY_DETAIL_WEEKS} viikolta ({views['detail_start']} alkaen).")
+        
+        if anomaly_df is None:
+            st.info("Poikkeamien tunnistukseen ei ole tuntidataa valitulta jaksolta.")
+        else:
+            anomaly_rows = anomaly_df[anomaly_df['is_anomaly']].sort_values(['date_str', 'Hour'])
+            anomaly_days = daily_anomalies[daily_anomalies['anomaly_day']]
+        
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric("Poikkeavat tunnit", f"{len(anomaly_rows)}/{len(anomaly_df)}")
+            with col2:
+                st.metric("Poikkeavat päivät", f"{len(anomaly_days)}/{len(daily_anomalies)}")
+        
+            if len(anomaly_days) > 0:
+                st.warning(
+                    "Näinä päivinä incidenttimäärät poikkeavat tavanomaisesta usean tunnin ajan "
+                    "(mahdollinen häiriö tiedonsiirrossa): " + ", ".join(anomaly_days['date'])
+                )
+        
+            if len(anomaly_rows) > 0:
+                st.dataframe(
+                    anomaly_rows[['date_str', 'day_name', 'Hour', 'Incidents handled by agent', 'baseline_median', 'anomaly_score', 'anomaly_direction']],
+                    column_config={
+                        'date_str': 'Päivämäärä',
+                        'day_name': 'Viikonpäivä',
+                        'Hour': 'Tunti',
+                        'Incidents handled by agent': 'Incidentit',
+                        'baseline_median': 'Tavanomainen (mediaani)',
+                        'anomaly_score': 'Poikkeama-arvo',
+                        'anomaly_direction': 'Suunta'
+                    },
+                    use_container_width=True,
+                    hide_index=True
+                )
+            else:
+                st.success("✅ Ei poikkeavia tunteja.")
+    
+    with tab5:
+        st.subheader("💡 Optimointisuositukset")
+        
+        if len(hourly_stats) > 0:
+            # Ongelmatunnit päivätyöntekijöille
+            day_problems = hourly_stats[
+                (hourly_stats['hour'] >= 7) & 
+                (hourly_stats['hour'] < 23) & 
+                (hourly_stats['incidents_per_worker'] < 5.1)
+            ]
+            
+            # Ongelmatunnit yötyöntekijöille  
+            night_problems = hourly_stats[
+                ((hourly_stats['hour'] >= 23) | (hourly_stats['hour'] < 7)) & 
+                (hourly_stats['incidents_per_worker'] < 4.6)
+            ]
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                st.markdown("### 🌅 Päivätyöntekijät")
+                if len(day_problems) > 0:
+                    st.error(f"Ongelmia {len(day_problems)} tunnissa:")
+                    for _, row in day_problems.iterrows():
+                        st.write(f"- {row['hour_str']}: {row['incidents_per_worker']} inc/työnt./h")
+                    st.markdown("**Suositus:** Vähennä henkilöstöä ali-tuottavina aikoina tai siirrä tehtäviä.")
+                else:
+                    st.success("✅ Kaikki tunnit täyttävät tavoitteen!")
+            
+            with col2:
+                st.markdown("### 🌙 Yötyöntekijät")
+                if len(night_problems) > 0:
+                    st.error(f"Ongelmia {len(night_problems)} tunnissa:")
+                    for _, row in night_problems.iterrows():
+                        st.write(f"- {row['hour_str']}: {row['incidents_per_worker']} inc/työnt./h")
+                    st.markdown("**Suositus:** Lisää henkilöstöä ongelmallisina aikoina.")
+                else:
+                    st.success("✅ Kaikki tunnit täyttävät tavoitteen!")
+            
+            # Kokonaiskuva
+            st.markdown("### 📊 Kokonaisarvio")
+            if day_avg >= 5.1 and night_avg >= 4.6:
+                st.success("🎉 Molemmat tuottavuustavoitteet saavutettu! Jatka samalla strategialla.")
+            elif day_avg >= 5.1:
+                st.warning("⚠️ Päivätyöntekijöiden tavoite saavutettu, mutta yötyöntekijät tarvitsevat parannusta.")
+            elif night_avg >= 4.6:
+                st.warning("⚠️ Yötyöntekijöiden tavoite saavutettu, mutta päivätyöntekijät tarvitsevat parannusta.")
+            else:
+                st.error("❌ Kumpikaan tuottavuustavoite ei täyty. Tarvitaan merkittäviä toimenpiteitä.")
+        else:
+            st.warning("Ei dataa suositusten tekemiseen.")
+    
+    with tab6:
+        st.subheader("🗓️ Viikonpäivä × tunti -kuormitusprofiili")
+        
+        if load_profile['count'].values.sum() > 0:
+            profile_value = st.radio(
+                "Näytettävä arvo:",
+                ["Incidentit/työntekijä", "Keskimääräiset incidentit"],
+                horizontal=True
+            )
+            
+            try:
+                fig_profile = create_load_profile_heatmap(
+                    load_profile, 'ratio' if profile_value == "Incidentit/työntekijä" else 'avg'
+                )
+                st.plotly_chart(fig_profile, use_container_width=True)
+            except Exception as e:
+                st.error(f"Virhe lämpökartan luonnissa: {str(e)}")
+                st.info("Näytetään data taulukkona:")
+                st.dataframe(calculate_load_profile_matrix(load_profile)[1])
+            
+            # Porautuminen yksittäisiin päivämääriin
+            st.subheader("🔍 Päiväkohtaiset tiedot")
+            col1, col2 = st.columns(2)
+            with col1:
+                drill_weekday = st.selectbox("Viikonpäivä:", range(7), format_func=lambda i: FINNISH_WEEKDAYS_LONG[i])
+            with col2:
+                drill_hour = st.selectbox("Kelloaika:", range(24), format_func=lambda h: f"{h:02d}:00")
+            
+            if views['history_range'] is not None:
+                drill_data = query_history_cell(*views['history_range'], drill_weekday, drill_hour)
+            else:
+                drill_data = anomaly_df[
+                    (anomaly_df['day_name'] == FINNISH_WEEKDAYS_LONG[drill_weekday]) &
+                    (anomaly_df['Hour'] == drill_hour)
+                ].sort_values('date_str')
+            
+            if len(drill_data) > 0:
+                st.dataframe(
+                    drill_data[['date_str', 'Incidents handled by agent', 'workers', 'incidents_per_worker']].round(2),
+                    column_config={
+                        'date_str': 'Päivämäärä',
+                        'Incidents handled by agent': 'Incidentit',
+                        'workers': 'Työntekijämäärä',
+                        'incidents_per_worker': 'Inc/työnt./h'
+                    },
+                    use_container_width=True,
+                    hide_index=True
+                )
+            else:
+                st.info("Valitulle viikonpäivälle ja tunnille ei ole dataa.")
+        else:
+            st.info("Viikkoprofiili vaatii päivämäärätiedot (Date-sarake).")
+    
+    with tab7:
+        st.subheader("🔮 Seuraavan viikon ennuste")
+        hourly_series = build_hourly_series(anomaly_df) if anomaly_df is not None else pd.Series(dtype=float)
+        
+        if len(hourly_series) >= HOURS_PER_WEEK:
+            col1, col2 = st.columns(2)
+            with col1:
+                forecast_method = st.radio(
+                    "Ennustemalli:",
+                    ["ses", "naive"],
+                    format_func=lambda m: "Eksponentiaalinen tasoitus" if m == "ses" else "Kausinaiivi (edellinen viikko)",
+                    horizontal=True
+                )
+            with col2:
+                forecast_alpha = st.slider(
+                    "Tasoituskerroin (alpha):", 0.05, 0.95, 0.3, 0.05,
+                    disabled=forecast_method == "naive",
+                    help="Suurempi arvo painottaa viimeisimpiä viikkoja enemmän"
+                )
+            
+            forecast_df = forecast_hourly_volume(hourly_series, forecast_method, forecast_alpha)
+            forecast_hourly = calculate_hourly_stats(forecast_df)
+            forecast_daily = calculate_daily_stats(forecast_df)
+            forecast_error = backtest_forecast(hourly_series, forecast_method, forecast_alpha)
+            
+            # Ennusteen tuottavuus samoilla tavoitteilla kuin toteumassa
+            forecast_day = forecast_df[(forecast_df['Hour'] >= 7) & (forecast_df['Hour'] < 23)]['incidents_per_worker'].mean()
+            forecast_night = forecast_df[(forecast_df['Hour'] >= 23) | (forecast_df['Hour'] < 7)]['incidents_per_worker'].mean()
+            
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Ennustetut incidentit", f"{forecast_df['Incidents handled by agent'].sum():.0f}")
+            with col2:
+                st.metric("Päivätyöntekijät (ennuste)", f"{forecast_day:.2f}", f"{forecast_day - 5.1:+.2f} vs. tavoite")
+            with col3:
+                st.metric("Yötyöntekijät (ennuste)", f"{forecast_night:.2f}", f"{forecast_night - 4.6:+.2f} vs. tavoite")
+            with col4:
+                st.metric("Virhe edell. viikolla (MAE)", f"{forecast_error:.2f} inc/h" if forecast_error is not None else "–")
+            
+            try:
+                recent = hourly_series.iloc[-2 * HOURS_PER_WEEK:]
+                fig_forecast = go.Figure()
+                fig_forecast.add_trace(go.Scatter(
+                    x=recent.index,
+                    y=recent.values,
+                    name='Toteuma',
+                    line=dict(color='gray', width=2),
+                    hovertemplate='<b>%{x}</b><br><b>Toteuma:</b> %{y:.0f}<extra></extra>'
+                ))
+                fig_forecast.add_trace(go.Scatter(
+                    x=forecast_df['timestamp'],
+                    y=forecast_df['Incidents handled by agent'],
+                    name='Ennuste',
+                    line=dict(color='#1f77b4', width=3, dash='dot'),
+                    hovertemplate='<b>%{x}</b><br><b>Ennuste:</b> %{y:.2f}<extra></extra>'
+                ))
+                fig_forecast.update_layout(
+                    height=450,
+                    title='Tuntikohtaiset incidentit: toteuma ja ennuste',
+                    xaxis_title='Aika',
+                    yaxis_title='Incidentit',
+                    hovermode='x unified'
+                )
+                st.plotly_chart(fig_forecast, use_container_width=True)
+            except Exception as e:
+                st.error(f"Virhe ennustekaavion luonnissa: {str(e)}")
+            
+            st.subheader("🎯 Ennustetut tavoitteet päivittäin")
+            forecast_display = forecast_daily.copy()
+            forecast_display['Päivätyöntekijät'] = forecast_display.apply(
+                lambda x: f"{x['day_shift_avg']:.2f} {'✅' if x['day_target_met'] else '❌'}", axis=1
+            )
+            forecast_display['Yötyöntekijät'] = forecast_display.apply(
+                lambda x: f"{x['night_shift_avg']:.2f} {'✅' if x['night_target_met'] else '❌'}", axis=1
+            )
+            st.dataframe(
+                forecast_display[['date', 'day_name', 'total_incidents', 'Päivätyöntekijät', 'Yötyöntekijät']],
+                column_config={
+                    'date': 'Päivämäärä',
+                    'day_name': 'Viikonpäivä',
+                    'total_incidents': 'Ennustetut inc.',
+                    'Päivätyöntekijät': 'Päivätyöntekijät',
+                    'Yötyöntekijät': 'Yötyöntekijät'
+                },
+                use_container_width=True
+            )
+            
+            with st.expander("📋 Ennusteen tuntikohtaiset keskiarvot"):
+                st.dataframe(
+                    forecast_hourly,
+                    column_config={
+                        'hour_str': 'Kelloaika',
+                        'avg_incidents': 'Keskim. incidentit',
+                        'worker_count': 'Työntekijämäärä',
+                        'incidents_per_worker': 'Inc/työnt./h',
+                        'days_count': 'Päivien lukumäärä'
+                    },
+                    use_container_width=True
+                )
+        else:
+            st.info("Ennuste vaatii vähintään yhden täyden viikon tuntidataa päivämäärineen.")
+
+def update_watch_state(start_date, end_date):
+    """Pidä tarkkailunäkymän trendit ja kuormitusprofiili istunnossa ja päivitä vain muuttuneet päivät"""
+    # Versio luetaan ennen dataa: myöhemmin tulleet muutokset haetaan uudelleen seuraavalla kierroksella
+    version = get_history_version()
+    state = st.session_state.get('watch_state')
+    
+    if state is None or start_date < state['start']:
+        processed_df = process_data(load_history_rows(start_date, end_date))
+        state = {
+            'start': start_date,
+            'version': version,
+            'trend': calculate_trend_stats(query_daily_stats(start_date, end_date)),
+            'profile': build_load_profile.__wrapped__(processed_df) if processed_df is not None else None
+        }
+    else:
+        # Aikavälin alku siirtyy vain päivän vaihtuessa; trendit lasketaan silloin päiväkoosteista
+        if start_date > state['start']:
+            if state['profile'] is not None:
+                state['profile'] = trim_load_profile(state['profile'], start_date)
+            state['trend'] = calculate_trend_stats(query_daily_stats(start_date, end_date))
+        
+        changed_dates = []
+        if version != state['version']:
+            changed_dates = [date for date in get_changed_dates(state['version']) if date >= str(start_date)]
+        
+        if changed_dates:
+            changed_daily = query_daily_stats(changed_dates[0], changed_dates[-1])
+            state['trend'] = update_trend_stats(state['trend'], changed_daily[changed_daily['date'].isin(changed_dates)])
+            
+            changed_df = process_data(load_history_rows(changed_dates[0], changed_dates[-1]))
+            if changed_df is not None:
+                changed_df = changed_df[changed_df['date_str'].isin(changed_dates)]
+                state['profile'] = update_load_profile(state['profile'], changed_df)
+        
+        state['start'] = start_date
+        state['version'] = version
+    
+    st.session_state['watch_state'] = state
+    return state['trend'], state['profile']
+
+def render_history_range(start_date, end_date, incremental=False):
+    """Näytä analyysi historiatietokannan aikaväliltä"""
+    try:
+        trend_stats, load_profile = update_watch_state(start_date, end_date) if incremental else (None, None)
+        views = build_history_views(start_date, end_date, trend_stats, load_profile)
+        
+        if len(views['daily']) > 0:
+            st.success(f"✅ Historiasta {len(views['daily'])} päivää aikaväliltä {start_date} – {end_date}.")
+            render_dashboard(views)
+        else:
+            st.info("Valitulla aikavälillä ei ole dataa.")
+    
+    except Exception as e:
+        st.error(f"Virhe historian käsittelyssä: {str(e)}")
+
 def main():
     # Otsikko
     st.title("📊 Hälytysten Analyysihallinta")
@@ -404,12 +1966,46 @@ def main():
     with st.sidebar:
         st.header("⚙️ Asetukset")
         
-        # Tiedoston lataus
-        uploaded_file = st.file_uploader(
-            "Lataa Excel-tiedosto",
-            type=['xlsx', 'xls'],
-            help="Tiedoston tulee sisältää sarakkeet: 'Hour', 'Incidents handled by agent', ja mahdollisesti 'Date'"
-        )
+        # Datan lähde
+        data_source = st.radio("Datan lähde:", ["Excel-tiedosto", "Historia", "Kansio"], horizontal=True)
+        
+        uploaded_file = None
+        history_dates = ()
+        history_range = None
+        if data_source == "Excel-tiedosto":
+            # Tiedoston lataus
+            uploaded_file = st.file_uploader(
+                "Lataa Excel-tiedosto",
+                type=['xlsx', 'xls'],
+                help="Tiedoston tulee sisältää sarakkeet: 'Hour', 'Incidents handled by agent', ja mahdollisesti 'Date'"
+            )
+            save_history = st.checkbox(
+                "💾 Tallenna historiaan",
+                help="Tallentaa päivämäärälliset rivit paikalliseen historiaan. Sama päivä ja tunti korvaa aiemman arvon."
+            )
+            shared_cache = get_shared_result_cache()
+            st.caption(
+                f"🗄️ Jaettu välimuisti: {len(shared_cache)} tiedostoa, "
+                f"{shared_cache.total_bytes / 1024 / 1024:.1f}/{shared_cache.max_bytes / 1024 / 1024:.0f} Mt"
+            )
+        elif data_source == "Kansio":
+            watch_folder = st.text_input(
+                "Tarkkailtava kansio:",
+                value=WATCH_DIR,
+                help="Uudet ja muuttuneet Excel-tiedostot tuodaan historiaan automaattisesti"
+            )
+            watch_days = st.number_input("Näytettävät päivät:", min_value=1, max_value=366, value=30)
+        else:
+            history_range = get_history_range()
+            if history_range is not None:
+                first_date, last_date, row_count = history_range
+                st.caption(f"Historiassa {row_count} tuntiriviä: {first_date} – {last_date}")
+                history_dates = st.date_input(
+                    "Aikaväli:",
+                    value=(max(first_date, last_date - timedelta(days=30)), last_date),
+                    min_value=first_date,
+                    max_value=last_date
+                )
         
         st.markdown("---")
         
@@ -435,370 +2031,59 @@ def main():
         """)
     
     # Pääsisältö
-    if uploaded_file is not None:
+    if data_source == "Historia":
+        if history_range is None:
+            st.info("Historiassa ei ole vielä dataa. Lataa Excel-tiedosto ja valitse '💾 Tallenna historiaan'.")
+        elif len(history_dates) == 2:
+            render_history_range(*history_dates)
+        else:
+            st.info("Valitse aikavälin alku- ja loppupäivä.")
+    
+    elif data_source == "Kansio":
+        if not watch_folder or not os.path.isdir(watch_folder):
+            st.info("👈 Anna sivupalkissa olemassa oleva kansio, johon tiedostot tallentuvat.")
+        else:
+            watch_folder_monitor(watch_folder)
+            history_range = get_history_range()
+            if history_range is None:
+                st.info("Kansiosta ei ole vielä tuotu dataa. Näkymä päivittyy automaattisesti, kun tiedostoja ilmestyy.")
+            else:
+                # Näytä viimeisimmät päivät historian loppuun asti
+                first_date, last_date, _ = history_range
+                start_date = max(first_date, last_date - timedelta(days=int(watch_days) - 1))
+                render_history_range(start_date, last_date, incremental=True)
+    
+    elif uploaded_file is not None:
         try:
-            # Lue Excel-tiedosto
-            df = pd.read_excel(uploaded_file)
-            st.success(f"✅ Tiedosto ladattu! Löydettiin {len(df)} riviä dataa.")
+            # Sama tiedosto samoilla asetuksilla käsitellään vain kerran kaikkien istuntojen kesken
+            file_bytes = uploaded_file.getvalue()
+            cache_key = (hashlib.sha256(file_bytes).hexdigest(), RESULT_CACHE_CONFIG)
+            results = get_shared_result_cache().get_or_compute(cache_key, lambda: compute_upload_results(file_bytes))
+            st.success(f"✅ Tiedosto ladattu! Löydettiin {results['raw_rows']} riviä dataa.")
             
             # Näytä datan otsikko
             with st.expander("📋 Näytä raakadata (ensimmäiset 10 riviä)"):
-                st.dataframe(df.head(10))
+                st.dataframe(results['raw_preview'])
                 
                 # Näytä sarakkeiden tietotyypit
                 st.subheader("Sarakkeiden tietotyypit:")
-                for col in df.columns:
-                    st.write(f"- **{col}**: {df[col].dtype}")
+                for col, dtype in results['raw_dtypes'].items():
+                    st.write(f"- **{col}**: {dtype}")
             
-            # Käsittele data
-            processed_df = process_data(df)
+            views = results['views']
             
-            if processed_df is not None:
-                st.success(f"✅ Data käsitelty onnistuneesti! {len(processed_df)} validia riviä.")
-                
-                # Laske tilastot
-                hourly_stats = calculate_hourly_stats(processed_df)
-                daily_stats = calculate_daily_stats(processed_df)
-                
-                # Tuottavuustavoitteiden analyysi
-                day_shift_data = processed_df[(processed_df['Hour'] >= 7) & (processed_df['Hour'] < 23)]
-                night_shift_data = processed_df[(processed_df['Hour'] >= 23) | (processed_df['Hour'] < 7)]
-                
-                day_avg = day_shift_data['incidents_per_worker'].mean() if len(day_shift_data) > 0 else 0
-                night_avg = night_shift_data['incidents_per_worker'].mean() if len(night_shift_data) > 0 else 0
-                
-                # Tulosten näyttäminen
-                st.header("🎯 Tuottavuustavoitteiden tulokset")
+            if views is not None:
+                # Poikkeamarivit sisältävät kaikki käsitellyn datan sarakkeet
+                st.success(f"✅ Data käsitelty onnistuneesti! {len(views['detail'])} validia riviä.")
                 
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    day_status = "✅ SAAVUTETTU" if day_avg >= 5.1 else "❌ EI SAAVUTETTU"
-                    day_color = "green" if day_avg >= 5.1 else "red"
-                    st.markdown(f"""
-                    <div style="padding: 20px; border: 2px solid {day_color}; border-radius: 10px; background-color: {'lightgreen' if day_avg >= 5.1 else 'lightcoral'};">
-                        <h3>🌅 Päivätyöntekijät (07-23)</h3>
-                        <p><strong>Keskiarvo:</strong> {day_avg:.2f} inc/työnt./h</p>
-                        <p><strong>Tavoite:</strong> ≥5.1 inc/työnt./h</p>
-                        <p><strong>Tulos:</strong> {day_status}</p>
-                        <p><strong>Ero:</strong> {day_avg - 5.1:+.2f}</p>
-                    </div>
-                    """, unsafe_allow_html=True)
-                
-                with col2:
-                    night_status = "✅ SAAVUTETTU" if night_avg >= 4.6 else "❌ EI SAAVUTETTU"
-                    night_color = "green" if night_avg >= 4.6 else "red"
-                    st.markdown(f"""
-                    <div style="padding: 20px; border: 2px solid {night_color}; border-radius: 10px; background-color: {'lightgreen' if night_avg >= 4.6 else 'lightcoral'};">
-                        <h3>🌙 Yötyöntekijät (23-07)</h3>
-                        <p><strong>Keskiarvo:</strong> {night_avg:.2f} inc/työnt./h</p>
-                        <p><strong>Tavoite:</strong> ≥4.6 inc/työnt./h</p>
-                        <p><strong>Tulos:</strong> {night_status}</p>
-                        <p><strong>Ero:</strong> {night_avg - 4.6:+.2f}</p>
-                    </div>
-                    """, unsafe_allow_html=True)
+                if save_history:
+                    # Tallennus tehdään kerran tiedostoa kohden, ei jokaisella widgetin aiheuttamalla uudelleenajolla
+                    stored_uploads = st.session_state.setdefault('stored_uploads', {})
+                    if cache_key not in stored_uploads:
+                        stored_uploads[cache_key] = store_history(views['detail'])
+                    st.info(f"💾 Historiaan tallennettu {stored_uploads[cache_key]} uutta tai muuttunutta riviä.")
                 
-                # Välilehdet eri näkymille
-                tab1, tab2, tab3, tab4, tab5 = st.tabs([
-                    "📊 Yhdistetty näkymä", 
-                    "📈 Tuntikohtainen analyysi", 
-                    "📅 Kuukausinäkymä",
-                    "📋 Yksityiskohtaiset tilastot",
-                    "💡 Suositukset"
-                ])
-                
-                with tab1:
-                    st.subheader("Yhdistetty analyysi")
-                    if len(hourly_stats) > 0:
-                        try:
-                            fig_combined = create_combined_chart(hourly_stats)
-                            st.plotly_chart(fig_combined, use_container_width=True)
-                        except Exception as e:
-                            st.error(f"Virhe kaavion luonnissa: {str(e)}")
-                            st.info("Näytetään data taulukkona:")
-                            st.dataframe(hourly_stats)
-                    else:
-                        st.warning("Ei dataa kaavion piirtämiseen.")
-                
-                with tab2:
-                    st.subheader("Tuntikohtainen analyysi")
-                    
-                    if len(hourly_stats) > 0:
-                        # Valitse näkymä
-                        chart_type = st.selectbox(
-                            "Valitse näkymä:",
-                            ["Incidentit/työntekijä", "Kokonaisincidentit", "Työntekijämäärät"]
-                        )
-                        
-                        try:
-                            if chart_type == "Incidentit/työntekijä":
-                                fig = px.line(
-                                    hourly_stats, 
-                                    x='hour_str', 
-                                    y='incidents_per_worker',
-                                    title='Incidentit per työntekijä tunnissa',
-                                    markers=True,
-                                    hover_data={
-                                        'hour_str': False,
-                                        'incidents_per_worker': ':.2f',
-                                        'worker_count': True,
-                                        'avg_incidents': ':.2f'
-                                    }
-                                )
-                                fig.update_traces(
-                                    hovertemplate='<b>Kelloaika:</b> %{x}<br>' +
-                                                 '<b>Incidentit/työntekijä:</b> %{y:.2f}<br>' +
-                                                 '<b>Työntekijämäärä:</b> %{customdata[0]}<br>' +
-                                                 '<b>Keskimääräiset incidentit:</b> %{customdata[1]:.2f}<br>' +
-                                                 '<extra></extra>',
-                                    customdata=hourly_stats[['worker_count', 'avg_incidents']].values
-                                )
-                                fig.add_hline(y=5.1, line_dash="dash", line_color="red", 
-                                             annotation_text="Päivätyöntekijöiden tavoite (5.1)")
-                                fig.add_hline(y=4.6, line_dash="dash", line_color="blue", 
-                                             annotation_text="Yötyöntekijöiden tavoite (4.6)")
-                            
-                            elif chart_type == "Kokonaisincidentit":
-                                fig = px.bar(
-                                    hourly_stats, 
-                                    x='hour_str', 
-                                    y='avg_incidents',
-                                    title='Keskimääräiset incidentit tunneittain',
-                                    hover_data={
-                                        'hour_str': False,
-                                        'avg_incidents': ':.2f',
-                                        'worker_count': True,
-                                        'incidents_per_worker': ':.2f'
-                                    }
-                                )
-                                fig.update_traces(
-                                    hovertemplate='<b>Kelloaika:</b> %{x}<br>' +
-                                                 '<b>Keskimääräiset incidentit:</b> %{y:.2f}<br>' +
-                                                 '<b>Työntekijämäärä:</b> %{customdata[0]}<br>' +
-                                                 '<b>Incidentit/työntekijä:</b> %{customdata[1]:.2f}<br>' +
-                                                 '<extra></extra>',
-                                    customdata=hourly_stats[['worker_count', 'incidents_per_worker']].values
-                                )
-                            
-                            else:  # Työntekijämäärät
-                                fig = px.bar(
-                                    hourly_stats, 
-                                    x='hour_str', 
-                                    y='worker_count',
-                                    title='Työntekijämäärät tunneittain',
-                                    hover_data={
-                                        'hour_str': False,
-                                        'worker_count': True,
-                                        'avg_incidents': ':.2f',
-                                        'incidents_per_worker': ':.2f'
-                                    }
-                                )
-                                fig.update_traces(
-                                    hovertemplate='<b>Kelloaika:</b> %{x}<br>' +
-                                                 '<b>Työntekijämäärä:</b> %{y}<br>' +
-                                                 '<b>Keskimääräiset incidentit:</b> %{customdata[0]:.2f}<br>' +
-                                                 '<b>Incidentit/työntekijä:</b> %{customdata[1]:.2f}<br>' +
-                                                 '<extra></extra>',
-                                    customdata=hourly_stats[['avg_incidents', 'incidents_per_worker']].values
-                                )
-                            
-                            # Yhteinen hover-tyyli kaikille kaavioille
-                            fig.update_layout(
-                                height=500,
-                                hovermode='x unified',
-                                hoverlabel=dict(
-                                    bgcolor="white",
-                                    font_size=14,
-                                    font_family="Arial",
-                                    bordercolor="gray"
-                                )
-                            )
-                            st.plotly_chart(fig, use_container_width=True)
-                            
-                        except Exception as e:
-                            st.error(f"Virhe kaavion luonnissa: {str(e)}")
-                            st.info("Näytetään data taulukkona:")
-                            st.dataframe(hourly_stats)
-                    else:
-                        st.warning("Ei dataa kaavion piirtämiseen.")
-                
-                with tab3:
-                    st.subheader("📅 Kuukausinäkymä")
-                    
-                    if len(daily_stats) >= 1:
-                        # Luo kalenterinäkymä
-                        try:
-                            calendar_html = create_calendar_view(daily_stats)
-                            if calendar_html:
-                                # Käytä korkeampaa height-arvoa jotta koko kalenteri mahtuu
-                                import streamlit.components.v1 as components
-                                components.html(calendar_html, height=900, scrolling=True)
-                            else:
-                                st.warning("Kalenterin luonti epäonnistui.")
-                        except Exception as e:
-                            st.error(f"Virhe kalenterin luonnissa: {str(e)}")
-                            st.info("Näytetään data taulukkona:")
-                            st.dataframe(daily_stats)
-                        
-                        # Kuukausistatistiikat
-                        st.subheader("📊 Kuukauden yhteenveto")
-                        col1, col2, col3, col4 = st.columns(4)
-                        
-                        day_target_met = len(daily_stats[daily_stats['day_target_met']]) 
-                        night_target_met = len(daily_stats[daily_stats['night_target_met']])
-                        total_days = len(daily_stats)
-                        
-                        with col1:
-                            st.metric("Päivätyöntekijät", f"{day_target_met}/{total_days}", f"{day_target_met/total_days*100:.1f}%")
-                        with col2:
-                            st.metric("Yötyöntekijät", f"{night_target_met}/{total_days}", f"{night_target_met/total_days*100:.1f}%")
-                        with col3:
-                            max_day = daily_stats.loc[daily_stats['total_incidents'].idxmax()]
-                            st.metric("Kiireisin päivä", f"{max_day['day']:.0f}. ({max_day['day_name']})", f"{max_day['total_incidents']:.0f} inc")
-                        with col4:
-                            min_day = daily_stats.loc[daily_stats['total_incidents'].idxmin()]
-                            st.metric("Rauhallisin päivä", f"{min_day['day']:.0f}. ({min_day['day_name']})", f"{min_day['total_incidents']:.0f} inc")
-                        
-                        # Päivittäinen kehitys
-                        try:
-                            fig_daily = px.line(
-                                daily_stats, 
-                                x='date', 
-                                y=['day_shift_avg', 'night_shift_avg'],
-                                title='Päivittäinen kehitys',
-                                labels={
-                                    'value': 'Inc/työnt./h', 
-                                    'variable': 'Vuoro',
-                                    'date': 'Päivämäärä'
-                                },
-                                hover_data={
-                                    'date': False,
-                                    'value': ':.2f'
-                                }
-                            )
-                            
-                            # Muuta legendan nimet suomeksi ja paranna tooltip
-                            fig_daily.for_each_trace(
-                                lambda t: t.update(
-                                    name='Päivätyöntekijät' if 'day_shift_avg' in t.name else 'Yötyöntekijät',
-                                    hovertemplate='<b>Päivämäärä:</b> %{x}<br>' +
-                                                 '<b>' + ('Päivätyöntekijät' if 'day_shift_avg' in t.name else 'Yötyöntekijät') + ':</b> %{y:.2f}<br>' +
-                                                 '<extra></extra>'
-                                )
-                            )
-                            
-                            fig_daily.add_hline(y=5.1, line_dash="dash", line_color="red", 
-                                              annotation_text="Päivätyöntekijöiden tavoite (5.1)")
-                            fig_daily.add_hline(y=4.6, line_dash="dash", line_color="blue", 
-                                              annotation_text="Yötyöntekijöiden tavoite (4.6)")
-                            
-                            fig_daily.update_layout(
-                                hovermode='x unified',
-                                hoverlabel=dict(
-                                    bgcolor="white",
-                                    font_size=14,
-                                    font_family="Arial",
-                                    bordercolor="gray"
-                                )
-                            )
-                            st.plotly_chart(fig_daily, use_container_width=True)
-                        except Exception as e:
-                            st.error(f"Virhe päivittäisen kehityksen kaavion luonnissa: {str(e)}")
-                            st.info("Näytetään data taulukkona:")
-                            st.dataframe(daily_stats[['date', 'day_shift_avg', 'night_shift_avg']])
-                        
-                        # Päivittäinen taulukko
-                        st.subheader("📋 Päivittäiset tulokset")
-                        daily_display = daily_stats.copy()
-                        daily_display['Päivätyöntekijät'] = daily_display.apply(
-                            lambda x: f"{x['day_shift_avg']:.2f} {'✅' if x['day_target_met'] else '❌'}", axis=1
-                        )
-                        daily_display['Yötyöntekijät'] = daily_display.apply(
-                            lambda x: f"{x['night_shift_avg']:.2f} {'✅' if x['night_target_met'] else '❌'}", axis=1
-                        )
-                        
-                        st.dataframe(
-                            daily_display[['date', 'day_name', 'total_incidents', 'Päivätyöntekijät', 'Yötyöntekijät']],
-                            column_config={
-                                'date': 'Päivämäärä',
-                                'day_name': 'Viikonpäivä',
-                                'total_incidents': 'Yhteensä inc.',
-                                'Päivätyöntekijät': 'Päivätyöntekijät',
-                                'Yötyöntekijät': 'Yötyöntekijät'
-                            },
-                            use_container_width=True
-                        )
-                    else:
-                        st.info("Kuukausinäkymä vaatii vähintään yhden päivän dataa.")
-                
-                with tab4:
-                    st.subheader("Tuntikohtaiset tilastot")
-                    if len(hourly_stats) > 0:
-                        st.dataframe(
-                            hourly_stats,
-                            column_config={
-                                'hour_str': 'Kelloaika',
-                                'avg_incidents': 'Keskim. incidentit',
-                                'worker_count': 'Työntekijämäärä',
-                                'incidents_per_worker': 'Inc/työnt./h',
-                                'days_count': 'Päivien lukumäärä'
-                            },
-                            use_container_width=True
-                        )
-                    else:
-                        st.warning("Ei tilastoja näytettäväksi.")
-                
-                with tab5:
-                    st.subheader("💡 Optimointisuositukset")
-                    
-                    if len(hourly_stats) > 0:
-                        # Ongelmatunnit päivätyöntekijöille
-                        day_problems = hourly_stats[
-                            (hourly_stats['hour'] >= 7) & 
-                            (hourly_stats['hour'] < 23) & 
-                            (hourly_stats['incidents_per_worker'] < 5.1)
-                        ]
-                        
-                        # Ongelmatunnit yötyöntekijöille  
-                        night_problems = hourly_stats[
-                            ((hourly_stats['hour'] >= 23) | (hourly_stats['hour'] < 7)) & 
-                            (hourly_stats['incidents_per_worker'] < 4.6)
-                        ]
-                        
-                        col1, col2 = st.columns(2)
-                        
-                        with col1:
-                            st.markdown("### 🌅 Päivätyöntekijät")
-                            if len(day_problems) > 0:
-                                st.error(f"Ongelmia {len(day_problems)} tunnissa:")
-                                for _, row in day_problems.iterrows():
-                                    st.write(f"- {row['hour_str']}: {row['incidents_per_worker']} inc/työnt./h")
-                                st.markdown("**Suositus:** Vähennä henkilöstöä ali-tuottavina aikoina tai siirrä tehtäviä.")
-                            else:
-                                st.success("✅ Kaikki tunnit täyttävät tavoitteen!")
-                        
-                        with col2:
-                            st.markdown("### 🌙 Yötyöntekijät")
-                            if len(night_problems) > 0:
-                                st.error(f"Ongelmia {len(night_problems)} tunnissa:")
-                                for _, row in night_problems.iterrows():
-                                    st.write(f"- {row['hour_str']}: {row['incidents_per_worker']} inc/työnt./h")
-                                st.markdown("**Suositus:** Lisää henkilöstöä ongelmallisina aikoina.")
-                            else:
-                                st.success("✅ Kaikki tunnit täyttävät tavoitteen!")
-                        
-                        # Kokonaiskuva
-                        st.markdown("### 📊 Kokonaisarvio")
-                        if day_avg >= 5.1 and night_avg >= 4.6:
-                            st.success("🎉 Molemmat tuottavuustavoitteet saavutettu! Jatka samalla strategialla.")
-                        elif day_avg >= 5.1:
-                            st.warning("⚠️ Päivätyöntekijöiden tavoite saavutettu, mutta yötyöntekijät tarvitsevat parannusta.")
-                        elif night_avg >= 4.6:
-                            st.warning("⚠️ Yötyöntekijöiden tavoite saavutettu, mutta päivätyöntekijät tarvitsevat parannusta.")
-                        else:
-                            st.error("❌ Kumpikaan tuottavuustavoite ei täyty. Tarvitaan merkittäviä toimenpiteitä.")
-                    else:
-                        st.warning("Ei dataa suositusten tekemiseen.")
+                render_dashboard(views)
         
         except Exception as e:
             st.error(f"Virhe tiedoston käsittelyssä: {str(e)}")
@@ -822,6 +2107,12 @@ def main():
            - 📅 Kuukausinäkymä
            - 📋 Tilastot
            - 💡 Suositukset
+           - 🗓️ Viikkoprofiili
+           - 🔮 Ennuste
+        4. **Tallenna historiaan** (valinnainen), jolloin voit myöhemmin analysoida
+           minkä tahansa aikavälin valitsemalla datan lähteeksi *Historia*
+        5. **Kansio**-tilassa sovellus tuo uudet tiedostot annetusta kansiosta
+           automaattisesti ja päivittää näkymän muutamassa sekunnissa
         """)
         
         st.markdown("### 🎯 Mitä työkalu analysoi:")
@@ -0,0 +1,21 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def hourly_export():
+    """Muodosta Excel-vientiä vastaava tuntidata annetulle päivämäärävälille"""
+    def make(start, days, seed=0, mean=14):
+        timestamps = pd.date_range(start, periods=24 * days, freq='h')
+        return pd.DataFrame({
+            'Date': timestamps.strftime('%Y-%m-%d'),
+            'Hour': timestamps.hour,
+            'Incidents handled by agent': np.random.default_rng(seed).poisson(mean, len(timestamps))
+        })
+    return make
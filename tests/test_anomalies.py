@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+
+import incident_analysis_dashboard as dashboard
+
+
+def inject(export, date, hours, factor):
+    """Kerro annetun päivän tuntien incidentit kertoimella (0 = tiedonsiirto katkesi)"""
+    mask = (export['Date'] == date) & export['Hour'].isin(hours)
+    export.loc[mask, 'Incidents handled by agent'] = export.loc[mask, 'Incidents handled by agent'] * factor
+    return export
+
+
+def test_doubled_and_zeroed_hours_are_flagged(hourly_export):
+    export = hourly_export('2024-01-01', 60, seed=7)
+    inject(export, '2024-02-07', range(9, 15), 2)
+    inject(export, '2024-02-14', range(9, 15), 0)
+
+    anomalies = dashboard.detect_anomalies(dashboard.process_data(export))
+    flagged = anomalies[anomalies['is_anomaly']]
+    assert sorted(zip(flagged['date_str'], flagged['Hour'])) == [
+        (date, hour) for date in ['2024-02-07', '2024-02-14'] for hour in range(9, 15)
+    ]
+
+    daily = dashboard.calculate_daily_anomalies(anomalies).set_index('date')
+    assert list(daily.index[daily['anomaly_day']]) == ['2024-02-07', '2024-02-14']
+    assert daily.loc['2024-02-07', 'high_hours'] == 6
+    assert daily.loc['2024-02-14', 'low_hours'] == 6
+
+
+def test_zeroed_hours_are_flagged_at_low_volume(hourly_export):
+    export = inject(hourly_export('2024-01-01', 60, mean=3), '2024-02-14', range(9, 15), 0)
+
+    anomalies = dashboard.detect_anomalies(dashboard.process_data(export))
+    daily = dashboard.calculate_daily_anomalies(anomalies)
+
+    assert list(daily.loc[daily['anomaly_day'], 'date']) == ['2024-02-14']
+    flagged = anomalies[anomalies['anomaly_segment']]
+    assert list(flagged['Hour']) == list(range(9, 15))
+
+
+@pytest.mark.parametrize('mean', [3, 14])
+def test_clean_data_has_no_anomaly_days(hourly_export, mean):
+    anomalies = dashboard.detect_anomalies(dashboard.process_data(hourly_export('2023-01-01', 365, mean=mean)))
+
+    assert not dashboard.calculate_daily_anomalies(anomalies)['anomaly_day'].any()
+
+
+def test_too_few_samples_are_not_scored(hourly_export):
+    anomalies = dashboard.detect_anomalies(dashboard.process_data(hourly_export('2024-01-01', 28)))
+
+    assert (anomalies['anomaly_score'] == 0).all()
+    assert not anomalies['is_anomaly'].any()
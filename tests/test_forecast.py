@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+import incident_analysis_dashboard as dashboard
+
+
+def test_forecast_covers_whole_days_from_next_midnight(hourly_export):
+    # Vienti päättyy kesken päivän (klo 13)
+    export = hourly_export('2024-01-01', 22).iloc[:-10]
+    series = dashboard.build_hourly_series(dashboard.process_data(export))
+    forecast = dashboard.forecast_hourly_volume(series, 'naive')
+
+    assert forecast['timestamp'].iloc[0] == pd.Timestamp('2024-01-23')
+    assert (forecast.groupby('date_str')['Hour'].count() == 24).all()
+    assert len(dashboard.calculate_daily_stats(forecast)) == 7
+
+
+def test_seasonal_naive_repeats_last_week_at_same_weekday_and_hour(hourly_export):
+    export = hourly_export('2024-01-01', 21).iloc[:-5]
+    series = dashboard.build_hourly_series(dashboard.process_data(export))
+    forecast = dashboard.forecast_hourly_volume(series, 'naive').set_index('timestamp')
+
+    for timestamp in forecast.index[::17]:
+        # Viikkoa aiemmin ei välttämättä ole vielä havaittu, jolloin käytetään kahden viikon takaista
+        weeks_back = 1 if timestamp - pd.Timedelta(weeks=1) <= series.index[-1] else 2
+        expected = series[timestamp - pd.Timedelta(weeks=weeks_back)]
+        assert np.isclose(forecast.loc[timestamp, 'Incidents handled by agent'], expected)
+
+
+def test_overlapping_exports_keep_last_value_per_hour(hourly_export):
+    export = hourly_export('2024-01-01', 14)
+    corrected = export.iloc[10 * 24:].copy()
+    corrected['Incidents handled by agent'] += 1
+    series = dashboard.build_hourly_series(dashboard.process_data(pd.concat([export, corrected])))
+
+    assert len(series) == 14 * 24
+    assert series.iloc[:10 * 24].tolist() == export['Incidents handled by agent'].iloc[:10 * 24].astype(float).tolist()
+    assert series.iloc[10 * 24:].tolist() == corrected['Incidents handled by agent'].astype(float).tolist()
@@ -0,0 +1,133 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import incident_analysis_dashboard as dashboard
+
+
+@pytest.fixture
+def history(tmp_path, hourly_export):
+    """Tallenna sama data historiaan ja palauta se käsiteltynä vertailua varten"""
+    db_path = str(tmp_path / 'history.db')
+    processed = dashboard.process_data(hourly_export('2024-01-01', 21, seed=3))
+    dashboard.store_history(processed, db_path=db_path)
+    return db_path, processed
+
+
+def test_query_hourly_stats_matches_pandas(history):
+    db_path, processed = history
+    queried = dashboard.query_hourly_stats('2024-01-01', '2024-01-21', db_path=db_path)
+
+    pd.testing.assert_frame_equal(queried, dashboard.calculate_hourly_stats(processed), check_dtype=False)
+
+
+def test_query_daily_stats_matches_pandas(history):
+    db_path, processed = history
+    queried = dashboard.query_daily_stats('2024-01-01', '2024-01-21', db_path=db_path)
+
+    pd.testing.assert_frame_equal(queried, dashboard.calculate_daily_stats(processed), check_dtype=False)
+
+
+def test_query_shift_averages_matches_pandas(history):
+    db_path, processed = history
+    queried = dashboard.query_shift_averages('2024-01-01', '2024-01-21', db_path=db_path)
+
+    assert queried == pytest.approx(dashboard.calculate_shift_averages(processed))
+
+
+def test_query_load_profile_matches_pandas(history):
+    db_path, processed = history
+    queried = dashboard.query_load_profile('2024-01-01', '2024-01-21', db_path=db_path)
+    expected = dashboard.build_load_profile(processed)
+
+    pd.testing.assert_frame_equal(queried['sum'], expected['sum'], check_names=False)
+    pd.testing.assert_frame_equal(queried['count'], expected['count'], check_names=False)
+
+
+def test_query_history_cell_returns_one_row_per_matching_day(history):
+    db_path, processed = history
+    cell = dashboard.query_history_cell('2024-01-01', '2024-01-21', 0, 9, db_path=db_path)
+
+    expected = processed[(processed['day_name'] == 'Maanantai') & (processed['Hour'] == 9)]
+    assert list(cell['date_str']) == ['2024-01-01', '2024-01-08', '2024-01-15']
+    assert list(cell['Incidents handled by agent']) == list(expected['Incidents handled by agent'])
+
+
+def test_aggregates_are_backfilled_for_existing_database(tmp_path, hourly_export):
+    db_path = str(tmp_path / 'history.db')
+    processed = dashboard.process_data(hourly_export('2024-01-01', 7))
+    dashboard.store_history(processed, db_path=db_path)
+
+    # Koosteita edeltävä tietokanta sisältää vain tuntirivit
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("DROP TABLE daily_aggregates")
+
+    daily = dashboard.query_daily_stats('2024-01-01', '2024-01-07', db_path=db_path)
+    pd.testing.assert_frame_equal(daily, dashboard.calculate_daily_stats(processed), check_dtype=False)
+    assert dashboard.get_history_version(db_path=db_path) is not None
+
+
+def test_changed_dates_update_trend_and_profile_incrementally(tmp_path, hourly_export):
+    db_path = str(tmp_path / 'history.db')
+    export = hourly_export('2024-01-01', 35, seed=5)
+    dashboard.store_history(dashboard.process_data(export.iloc[:30 * 24]), db_path=db_path)
+
+    version = dashboard.get_history_version(db_path=db_path)
+    trend = dashboard.calculate_trend_stats(dashboard.query_daily_stats('2024-01-01', '2024-01-30', db_path=db_path))
+    profile = dashboard.build_load_profile(dashboard.process_data(export.iloc[:30 * 24]))
+
+    # Uusi vienti korjaa kaksi viimeistä päivää ja tuo viisi uutta
+    update = export.iloc[28 * 24:].copy()
+    update['Incidents handled by agent'] += 1
+    dashboard.store_history(dashboard.process_data(update), db_path=db_path)
+
+    changed = dashboard.get_changed_dates(version, db_path=db_path)
+    assert changed == list(pd.date_range('2024-01-29', '2024-02-04').strftime('%Y-%m-%d'))
+    assert dashboard.get_history_version(db_path=db_path) > version
+
+    changed_daily = dashboard.query_daily_stats(changed[0], changed[-1], db_path=db_path)
+    trend = dashboard.update_trend_stats(trend, changed_daily)
+    profile = dashboard.update_load_profile(profile, dashboard.process_data(update))
+
+    full_daily = dashboard.query_daily_stats('2024-01-01', '2024-02-04', db_path=db_path)
+    pd.testing.assert_frame_equal(trend, dashboard.calculate_trend_stats(full_daily))
+    full_profile = dashboard.query_load_profile('2024-01-01', '2024-02-04', db_path=db_path)
+    pd.testing.assert_frame_equal(profile['sum'], full_profile['sum'], check_names=False)
+
+
+def test_trim_load_profile_drops_days_before_window(hourly_export):
+    processed = dashboard.process_data(hourly_export('2024-01-01', 21))
+    trimmed = dashboard.trim_load_profile(dashboard.build_load_profile(processed), '2024-01-08')
+    expected = dashboard.build_load_profile(processed[processed['date_str'] >= '2024-01-08'])
+
+    pd.testing.assert_frame_equal(trimmed['sum'], expected['sum'])
+    pd.testing.assert_frame_equal(trimmed['count'], expected['count'])
+
+
+def test_storing_unchanged_rows_keeps_version(history):
+    db_path, processed = history
+    version = dashboard.get_history_version(db_path=db_path)
+
+    assert dashboard.store_history(processed, db_path=db_path) == 0
+    assert dashboard.get_history_version(db_path=db_path) == version
+
+    # Vain muuttuneen päivän kooste päivittyy
+    corrected = processed[processed['date_str'] == '2024-01-10'].copy()
+    corrected['Incidents handled by agent'] += 1
+    assert dashboard.store_history(corrected, db_path=db_path) == 24
+    assert dashboard.get_changed_dates(version, db_path=db_path) == ['2024-01-10']
+
+
+def test_days_before_detail_window_are_marked_unchecked(tmp_path, hourly_export):
+    db_path = str(tmp_path / 'history.db')
+    dashboard.store_history(dashboard.process_data(hourly_export('2024-01-01', 90)), db_path=db_path)
+
+    views = dashboard.build_history_views(pd.Timestamp('2024-01-01').date(), pd.Timestamp('2024-03-30').date(), db_path=db_path)
+    daily = views['daily'].set_index('date')
+    detail_start = str(views['detail_start'])
+
+    assert detail_start == '2024-02-04'
+    assert not daily.loc[daily.index < detail_start, 'anomaly_checked'].any()
+    assert daily.loc[daily.index >= detail_start, 'anomaly_checked'].all()
+    assert 'ei tarkistettu' in dashboard.create_calendar_view(views['daily'])
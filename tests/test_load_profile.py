@@ -0,0 +1,36 @@
+import pandas as pd
+
+import incident_analysis_dashboard as dashboard
+
+
+def test_profile_counts_each_day_once_per_weekday_and_hour(hourly_export):
+    profile = dashboard.build_load_profile(dashboard.process_data(hourly_export('2024-01-01', 28)))
+
+    assert profile['count'].shape == (7, 24)
+    assert (profile['count'] == 4).all().all()
+
+
+def test_overlapping_update_replaces_instead_of_double_counting(hourly_export):
+    export = hourly_export('2024-01-01', 28)
+    full = dashboard.build_load_profile(dashboard.process_data(export))
+
+    # Yöllinen vienti sisältää edellisen vientien viimeiset päivät uudelleen
+    first = dashboard.process_data(export.iloc[:20 * 24])
+    overlapping = dashboard.process_data(export.iloc[15 * 24:])
+    profile = dashboard.update_load_profile(dashboard.build_load_profile(first), overlapping)
+
+    pd.testing.assert_frame_equal(profile['count'], full['count'])
+    pd.testing.assert_frame_equal(profile['sum'], full['sum'])
+
+
+def test_update_replaces_changed_values(hourly_export):
+    export = hourly_export('2024-01-01', 14)
+    profile = dashboard.build_load_profile(dashboard.process_data(export))
+
+    corrected = export.iloc[:1].copy()
+    corrected['Incidents handled by agent'] += 10
+    updated = dashboard.update_load_profile(profile, dashboard.process_data(corrected))
+
+    weekday = pd.Timestamp('2024-01-01').weekday()
+    assert updated['sum'].loc[weekday, 0] == profile['sum'].loc[weekday, 0] + 10
+    assert updated['count'].loc[weekday, 0] == profile['count'].loc[weekday, 0]
@@ -0,0 +1,74 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import incident_analysis_dashboard as dashboard
+
+
+def test_concurrent_requests_compute_once():
+    cache = dashboard.SharedResultCache(10 * 1024 * 1024)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return {'stats': pd.DataFrame({'hour': range(24)}), 'rows': 24}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_compute('key', compute)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert all(result['rows'] == 24 for result in results)
+    assert cache._key_locks == {}
+
+
+def test_finished_request_keeps_newer_key_lock():
+    cache = dashboard.SharedResultCache(10 * 1024 * 1024)
+    newer_lock = threading.Lock()
+
+    def compute():
+        # Uusi pyyntö rekisteröi oman lukkonsa ennen kuin tämä laskenta päättyy
+        cache._key_locks['key'] = newer_lock
+        return {'views': None}
+
+    cache.get_or_compute('key', compute)
+
+    assert cache._key_locks.get('key') is newer_lock
+
+
+def test_nested_frames_are_shared_read_only():
+    cache = dashboard.SharedResultCache(10 * 1024 * 1024)
+    compute = lambda: {'views': {'hourly': pd.DataFrame({'avg_incidents': [1.0, 2.0]})}}
+
+    hourly = cache.get_or_compute('key', compute)['views']['hourly']
+    assert len(cache) == 1
+
+    with pytest.raises(ValueError):
+        hourly.loc[0, 'avg_incidents'] = 5.0
+    hourly = hourly.copy()
+    hourly.loc[0, 'avg_incidents'] = 5.0
+    assert cache.get_or_compute('key', compute)['views']['hourly'].loc[0, 'avg_incidents'] == 1.0
+
+
+def test_cached_upload_views_keep_profile_labels(tmp_path, hourly_export):
+    path = tmp_path / 'export.xlsx'
+    hourly_export('2024-01-01', 14).to_excel(path, index=False)
+    file_bytes = path.read_bytes()
+
+    cache = dashboard.SharedResultCache(10 * 1024 * 1024)
+    views = cache.get_or_compute('key', lambda: dashboard.compute_upload_results(file_bytes))['views']
+    expected = dashboard.build_load_profile(dashboard.process_data(hourly_export('2024-01-01', 14)))
+
+    for agg in ['sum', 'count']:
+        pd.testing.assert_frame_equal(views['profile'][agg], expected[agg])
+    weekday = pd.Timestamp('2024-01-01').weekday()
+    assert views['profile']['count'].loc[weekday, 0] == 2
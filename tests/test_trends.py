@@ -0,0 +1,49 @@
+import pandas as pd
+
+import incident_analysis_dashboard as dashboard
+
+
+def test_daily_stats_tolerate_unparseable_dates():
+    df = pd.DataFrame({
+        'Date': ['2025-02-02', 'rikki', '2025-02-01'],
+        'Hour': [0, 1, 2],
+        'Incidents handled by agent': [9, 14, 16]
+    })
+    daily_stats = dashboard.calculate_daily_stats(dashboard.process_data(df))
+
+    assert list(daily_stats['date'].iloc[:2]) == ['2025-02-01', '2025-02-02']
+    assert pd.isna(daily_stats['date'].iloc[2])
+    assert list(dashboard.calculate_trend_stats(daily_stats)['date']) == ['2025-02-01', '2025-02-02']
+
+
+def test_incremental_update_matches_full_recompute(hourly_export):
+    daily_stats = dashboard.calculate_daily_stats(dashboard.process_data(hourly_export('2024-01-01', 90)))
+    full = dashboard.calculate_trend_stats(daily_stats)
+
+    # Historia 60 päivään asti, sitten yksi muuttunut päivä ja loput uusina päivinä
+    partial = daily_stats.iloc[:60].copy()
+    partial.loc[50, 'day_shift_avg'] = 9.99
+    trend = dashboard.calculate_trend_stats(partial)
+    trend = dashboard.update_trend_stats(trend, daily_stats.iloc[50:60])
+    trend = dashboard.update_trend_stats(trend, daily_stats.iloc[60:])
+
+    pd.testing.assert_frame_equal(trend, full, check_dtype=False)
+
+
+def test_streak_breaks_on_missing_days():
+    daily_stats = pd.DataFrame({
+        'date': ['2025-01-01', '2025-01-02', '2025-01-12', '2025-01-13'],
+        'day_name': ['Keskiviikko', 'Torstai', 'Sunnuntai', 'Maanantai'],
+        'total_incidents': [100] * 4,
+        'day_shift_avg': [6.0] * 4,
+        'night_shift_avg': [3.0] * 4,
+        'day_target_met': [True] * 4,
+        'night_target_met': [False] * 4
+    })
+    trend = dashboard.calculate_trend_stats(daily_stats)
+
+    assert list(trend['day_streak']) == [1, 2, 1, 2]
+    assert list(trend['night_streak']) == [0, 0, 0, 0]
+
+    updated = dashboard.update_trend_stats(trend.iloc[:3], daily_stats.iloc[3:])
+    assert list(updated['day_streak']) == [1, 2, 1, 2]
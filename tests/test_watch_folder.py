@@ -0,0 +1,36 @@
+import os
+
+import incident_analysis_dashboard as dashboard
+
+
+def test_only_new_or_changed_files_are_ingested(tmp_path, hourly_export):
+    folder = tmp_path / 'watch'
+    folder.mkdir()
+    db_path = str(tmp_path / 'history.db')
+    path = folder / 'export.xlsx'
+    hourly_export('2024-01-01', 3).to_excel(path, index=False)
+
+    assert dashboard.ingest_watch_folder(str(folder), db_path) == (['export.xlsx'], {})
+    assert dashboard.get_history_range(db_path)[2] == 3 * 24
+
+    # Pelkkä muokkausajan muutos ei tuo tiedostoa uudelleen
+    os.utime(path, (path.stat().st_atime, path.stat().st_mtime + 60))
+    assert dashboard.ingest_watch_folder(str(folder), db_path) == ([], {})
+
+    hourly_export('2024-01-01', 5).to_excel(path, index=False)
+    os.utime(path, (path.stat().st_atime, path.stat().st_mtime + 120))
+    assert dashboard.ingest_watch_folder(str(folder), db_path) == (['export.xlsx'], {})
+    assert dashboard.get_history_range(db_path)[2] == 5 * 24
+
+
+def test_unreadable_file_is_reported_once(tmp_path):
+    folder = tmp_path / 'watch'
+    folder.mkdir()
+    db_path = str(tmp_path / 'history.db')
+    (folder / 'broken.xlsx').write_bytes(b'not an excel file')
+
+    ingested, failed = dashboard.ingest_watch_folder(str(folder), db_path)
+    assert ingested == [] and list(failed) == ['broken.xlsx']
+
+    # Kirjattua tiedostoa ei lueta uudelleen, ennen kuin sen muokkausaika muuttuu
+    assert dashboard.ingest_watch_folder(str(folder), db_path) == ([], {})